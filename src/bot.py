@@ -18,20 +18,32 @@ Version: 1.0.0
 """
 
 import asyncio
+import atexit
+import aiofiles
+import aiohttp
 import cv2
-import requests
+import hashlib
 import os
 import sys
 import time
 import threading
 import json
+import locale
+import logging
+import queue
+import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Optional, Dict, List
+from types import MappingProxyType
+from typing import Optional, Dict, List, Tuple
+from urllib.parse import urlsplit
 
 try:
-    from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+    from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+    from telegram.error import RetryAfter
     from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 except ImportError:
     print("[ERROR] python-telegram-bot not installed")
@@ -59,17 +71,37 @@ class Config:
     CAPTURE_DIR: Path = BASE_DIR / "captures"
     CONFIG_FILE: Path = BASE_DIR / "config.json"
     CONFIG_TXT: Path = BASE_DIR / "config.txt"
+    FILE_ID_CACHE: Path = CAPTURE_DIR / "_fileids.json"
     
     # Capture settings
     STARTUP_CAPTURES: int = 3
     CAPTURE_DELAY: float = 2.0
-    CAMERA_WARMUP: int = 10
+    CAMERA_WARMUP: float = 0.5  # seconds of frames discarded after opening
+    CAMERA_IDLE_RELEASE: float = 30.0  # seconds the webcam stays open after a shot
+    CAMERA_WIDTH: int = 1280
+    CAMERA_HEIGHT: int = 720
+    JPEG_QUALITY: int = 85
+    MAX_IMAGE_SIDE: int = 1280  # px, longer frames are downscaled before upload
     
     # Network settings
     INTERNET_CHECK_URL: str = "https://api.telegram.org"
     INTERNET_TIMEOUT: int = 5
+    # Plain TCP connect (no TLS) to the host we actually need; DNS resolvers
+    # like 1.1.1.1:53 are often filtered on networks where Telegram works
+    INTERNET_PROBE: Tuple[str, int] = (urlsplit(INTERNET_CHECK_URL).hostname, 443)
+    INTERNET_RETRY_DELAYS: Tuple[float, ...] = (0.5, 1, 2, 4, 8, 16)
+    HTTP_TIMEOUT: int = 10
+    SEND_CONCURRENCY: int = 5  # parallel uploads, kept low for Telegram flood limits
+    MEDIA_GROUP_LIMIT: int = 10  # max photos per Telegram album
     LOCATION_API: str = "http://ip-api.com/json/"
     
+    # Threads shared by webcam, file and other blocking work
+    WORKER_THREADS: int = 4
+    
+    # Cache lifetimes (seconds)
+    LOCATION_CACHE_TTL: float = 300
+    INTERNET_CACHE_TTL: float = 10
+    
     @classmethod
     def load_config(cls):
         """Load configuration from config.txt"""
@@ -84,24 +116,40 @@ class Config:
             return False
         
         try:
-            with open(cls.CONFIG_TXT, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith('#') or '=' not in line:
-                        continue
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    value = value.strip()
-                    
-                    if key == 'BOT_TOKEN':
-                        cls.BOT_TOKEN = value
-                    elif key == 'ADMIN_ID':
-                        cls.ADMIN_ID = int(value) if value.isdigit() else 0
+            values = cls._parse_config_txt()
+            cls.BOT_TOKEN = values.get('bot_token') or ""
+            try:
+                # Group chat IDs are negative, so no isdigit() here
+                cls.ADMIN_ID = int(values.get('admin_id') or 0)
+            except ValueError:
+                cls.ADMIN_ID = 0
             return True
         except Exception as e:
             print(f"Error loading config: {e}")
             return False
     
+    # (mtime_ns, values) of the last parsed config.txt
+    _config_cache: Optional[Tuple[int, MappingProxyType]] = None
+    
+    @classmethod
+    def _parse_config_txt(cls) -> MappingProxyType:
+        """Parse config.txt into a read-only mapping (keys lowercased), reparsing only when it changed"""
+        mtime = cls.CONFIG_TXT.stat().st_mtime_ns
+        if cls._config_cache and cls._config_cache[0] == mtime:
+            return cls._config_cache[1]
+        
+        # Plain KEY=VALUE lines; anything else (comments, junk) is skipped
+        values = {}
+        for line in cls.CONFIG_TXT.read_text().splitlines():
+            line = line.strip()
+            if line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            values[key.strip().lower()] = value.strip()
+        values = MappingProxyType(values)
+        cls._config_cache = (mtime, values)
+        return values
+    
     @classmethod
     def ensure_dirs(cls):
         """Ensure required directories exist"""
@@ -120,6 +168,8 @@ class ProgressBar:
         self.prefix = prefix
         self.width = width
         self.current = 0
+        # Every possible bar, indexed by filled cells
+        self._bars = ["█" * i + "░" * (width - i) for i in range(width + 1)]
     
     def update(self, step: int = 1):
         self.current += step
@@ -130,9 +180,8 @@ class ProgressBar:
         if sys.stdout is None:
             return
         try:
-            percent = self.current / self.total
-            filled = int(self.width * percent)
-            bar = "█" * filled + "░" * (self.width - filled)
+            percent = min(self.current / self.total, 1.0)
+            bar = self._bars[int(self.width * percent)]
             sys.stdout.write(f"\r{self.prefix} [{bar}] {percent*100:.0f}%")
             sys.stdout.flush()
             if self.current >= self.total:
@@ -162,16 +211,32 @@ class ProgressBar:
 
 
 class Logger:
-    """Simple logger - handles noconsole mode"""
+    """Simple logger - handles noconsole mode, writes on a background thread"""
+    
+    _logger = logging.getLogger("teleguard")
+    _listener: Optional[QueueListener] = None
+    
+    @classmethod
+    def start(cls):
+        """Route messages through a queue drained to stdout by a listener thread"""
+        if sys.stdout is None or cls._listener is not None:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log_queue = queue.SimpleQueue()
+        cls._listener = QueueListener(log_queue, handler)
+        cls._listener.start()
+        cls._logger.addHandler(QueueHandler(log_queue))
+        cls._logger.setLevel(logging.INFO)
+        cls._logger.propagate = False
+        # Drain whatever is still queued before the interpreter exits
+        atexit.register(cls._listener.stop)
     
     @staticmethod
     def _print(msg: str):
-        """Safe print that works in noconsole mode"""
-        if sys.stdout is not None:
-            try:
-                print(msg)
-            except:
-                pass
+        """Safe print that works in noconsole mode (only enqueues)"""
+        if Logger._listener is not None:
+            Logger._logger.info(msg)
     
     @staticmethod
     def info(msg: str):
@@ -203,6 +268,46 @@ class Logger:
 
 
 log = Logger()
+Logger.start()
+
+
+# One pool for all blocking work; not the loop's default executor, since
+# closing the loop would shut it down and main() may run more than once
+_POOL = ThreadPoolExecutor(max_workers=Config.WORKER_THREADS, thread_name_prefix="teleguard")
+
+
+async def run_blocking(func, *args):
+    """Run a blocking call on the shared worker pool without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_POOL, func, *args)
+
+
+async def run_hidden(*args: str, timeout: float) -> str:
+    """Run a console command without a window and return its stdout"""
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        creationflags=subprocess.CREATE_NO_WINDOW
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        # Also on cancel, so a stopped bot leaves no PowerShell behind
+        proc.kill()
+        await proc.wait()
+        raise
+    return stdout.decode(locale.getpreferredencoding(False), errors="replace")
+
+
+async def flood_safe(method, **kwargs):
+    """Call a Bot API method, waiting out Telegram flood control once"""
+    try:
+        return await method(**kwargs)
+    except RetryAfter as e:
+        log.warning(f"Flood control, retrying in {e.retry_after}s")
+        await asyncio.sleep(e.retry_after)
+        return await method(**kwargs)
 
 
 # ============================================
@@ -216,6 +321,7 @@ class StorageManager:
         Config.ensure_dirs()
         self.admin_id: Optional[int] = None
         self._load_config()
+        self._file_ids: Dict[str, str] = self._load_file_ids()
     
     def _load_config(self):
         """Load configuration from file"""
@@ -241,19 +347,82 @@ class StorageManager:
         self.save_config()
         log.success(f"Admin registered: {chat_id}")
     
+    @staticmethod
+    def _load_file_ids() -> Dict[str, str]:
+        """Load Telegram file_ids of photos that were uploaded but not deleted"""
+        try:
+            with open(Config.FILE_ID_CACHE, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            log.warning(f"Failed to load file_id cache: {e}")
+            return {}
+    
+    def _save_file_ids(self):
+        """Save the file_id cache"""
+        try:
+            with open(Config.FILE_ID_CACHE, 'w') as f:
+                json.dump(self._file_ids, f)
+        except Exception as e:
+            log.warning(f"Failed to save file_id cache: {e}")
+    
+    @staticmethod
+    def file_digest(data: bytes) -> str:
+        """Content hash used as file_id cache key"""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    
+    def get_file_id(self, digest: str) -> Optional[str]:
+        """Telegram file_id of an already uploaded photo, if known"""
+        return self._file_ids.get(digest)
+    
+    def remember_file_id(self, digest: str, file_id: str):
+        """Remember an upload so a re-send costs no bandwidth"""
+        if self._file_ids.get(digest) != file_id:
+            self._file_ids[digest] = file_id
+            self._save_file_ids()
+    
+    def forget_file_id(self, digest: str):
+        """Drop a cache entry once its file is gone"""
+        if self._file_ids.pop(digest, None) is not None:
+            self._save_file_ids()
+    
+    @staticmethod
+    def _is_pending(name: str) -> bool:
+        """Photos and location_* json files (not config files) are pending"""
+        return name.endswith(".jpg") or (name.startswith("location_") and name.endswith(".json"))
+    
     def get_pending_files(self) -> List[Path]:
-        """Get list of files waiting to be sent"""
-        photos = list(Config.CAPTURE_DIR.glob("*.jpg"))
-        # Only get location_* json files, not config files
-        locations = list(Config.CAPTURE_DIR.glob("location_*.json"))
+        """Get list of files waiting to be sent (photos first)"""
+        photos, locations = [], []
+        try:
+            with os.scandir(Config.CAPTURE_DIR) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.endswith(".jpg"):
+                        photos.append(Path(entry.path))
+                    elif self._is_pending(name):
+                        locations.append(Path(entry.path))
+        except FileNotFoundError:
+            pass
         return photos + locations
     
-    def delete_file(self, filepath: Path):
+    def pending_count(self) -> int:
+        """Count files waiting to be sent without building Path objects"""
+        try:
+            with os.scandir(Config.CAPTURE_DIR) as entries:
+                return sum(1 for entry in entries if self._is_pending(entry.name))
+        except FileNotFoundError:
+            return 0
+    
+    def delete_file(self, filepath: Path) -> bool:
         """Delete a file after sending"""
         try:
             os.remove(filepath)
+            return True
         except Exception as e:
             log.warning(f"Failed to delete {filepath}: {e}")
+            return False
 
 
 storage = StorageManager()
@@ -264,23 +433,69 @@ storage = StorageManager()
 # ============================================
 
 class NetworkManager:
-    """Handles network-related operations"""
+    """Handles network-related operations (async, shared aiohttp session)"""
+    
+    # (timestamp, value) of the most recent lookups
+    _loc_cache: Optional[Tuple[float, Dict]] = None
+    _internet_cache: Optional[Tuple[float, bool]] = None
+    
+    # One BSSID block of `netsh wlan show networks mode=bssid` -> (mac, signal %)
+    _WIFI_RE = re.compile(
+        r'BSSID\s*\d*\s*:\s*([0-9a-f]{2}(?::[0-9a-f]{2}){5})'
+        r'(?:(?!BSSID).)*?(?:Signal|سیگنال)\s*:\s*(\d+)\s*%',
+        re.DOTALL | re.IGNORECASE
+    )
     
     @staticmethod
-    def check_internet() -> bool:
-        """Check if internet connection is available"""
+    def create_session() -> aiohttp.ClientSession:
+        """Create the HTTP session shared by all network calls of one event loop"""
+        # Keep-alive pool: each host pays for DNS + TLS once, not per request
+        connector = aiohttp.TCPConnector(
+            limit=8, limit_per_host=4, ttl_dns_cache=300, keepalive_timeout=60
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT)
+        )
+    
+    @classmethod
+    async def check_internet(cls, session: aiohttp.ClientSession) -> bool:
+        """Check if internet connection is available (cached briefly)"""
+        now = time.monotonic()
+        if cls._internet_cache and now - cls._internet_cache[0] < Config.INTERNET_CACHE_TTL:
+            return cls._internet_cache[1]
+        
         try:
-            requests.get(Config.INTERNET_CHECK_URL, timeout=Config.INTERNET_TIMEOUT)
-            return True
-        except:
-            return False
+            timeout = aiohttp.ClientTimeout(total=Config.INTERNET_TIMEOUT)
+            async with session.get(Config.INTERNET_CHECK_URL, timeout=timeout):
+                online = True
+        except Exception:
+            online = False
+        
+        cls._internet_cache = (time.monotonic(), online)
+        return online
+    
+    @classmethod
+    async def wait_for_internet(cls) -> bool:
+        """Wait until a TCP connection can be opened, retrying with backoff"""
+        for delay in Config.INTERNET_RETRY_DELAYS + (None,):
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(*Config.INTERNET_PROBE),
+                    timeout=Config.INTERNET_TIMEOUT
+                )
+                writer.close()
+                cls._internet_cache = (time.monotonic(), True)
+                return True
+            except (OSError, asyncio.TimeoutError):
+                if delay is None:
+                    return False
+                await asyncio.sleep(delay)
     
     @staticmethod
-    def get_windows_location() -> Optional[Dict]:
+    async def get_windows_location() -> Optional[Dict]:
         """Try to get precise location from Windows Location API with retries"""
         try:
-            import subprocess
-            
             # Use PowerShell to get Windows Location with longer timeout
             ps_script = '''
 Add-Type -AssemblyName System.Device
@@ -299,14 +514,13 @@ if ($watcher.Status -eq 'Ready') {
 }
 $watcher.Stop()
 '''
-            result = subprocess.run(
-                ['powershell', '-WindowStyle', 'Hidden', '-Command', ps_script],
-                capture_output=True, text=True, timeout=40,
-                creationflags=subprocess.CREATE_NO_WINDOW
+            output = await run_hidden(
+                'powershell', '-WindowStyle', 'Hidden', '-Command', ps_script,
+                timeout=40
             )
             
-            if result.stdout.strip():
-                parts = result.stdout.strip().split(',')
+            if output.strip():
+                parts = output.strip().split(',')
                 if len(parts) >= 2:
                     try:
                         lat = float(parts[0])
@@ -328,52 +542,32 @@ $watcher.Stop()
         return None
     
     @staticmethod
-    def get_wifi_location() -> Optional[Dict]:
+    async def scan_wifi_networks() -> List[Dict]:
+        """Scan nearby Wi-Fi access points using netsh"""
+        output = await run_hidden(
+            'netsh', 'wlan', 'show', 'networks', 'mode=bssid',
+            timeout=10
+        )
+        
+        if not output:
+            return []
+        
+        # Convert signal percentage to dBm (approximate)
+        wifi_networks = [
+            {
+                "macAddress": match.group(1).lower(),
+                "signalStrength": int(int(match.group(2)) / 2 - 100)
+            }
+            for match in NetworkManager._WIFI_RE.finditer(output)
+        ]
+        
+        return wifi_networks
+    
+    @staticmethod
+    async def get_wifi_location(session: aiohttp.ClientSession) -> Optional[Dict]:
         """Try to get location using Wi-Fi networks via Mozilla Location Service"""
         try:
-            import subprocess
-            
-            # Get nearby Wi-Fi networks using netsh
-            result = subprocess.run(
-                ['netsh', 'wlan', 'show', 'networks', 'mode=bssid'],
-                capture_output=True, text=True, timeout=10,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            
-            if not result.stdout:
-                return None
-            
-            # Parse Wi-Fi networks
-            wifi_networks = []
-            current_ssid = None
-            current_bssid = None
-            current_signal = None
-            
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                if 'SSID' in line and 'BSSID' not in line:
-                    parts = line.split(':', 1)
-                    if len(parts) > 1:
-                        current_ssid = parts[1].strip()
-                elif 'BSSID' in line:
-                    parts = line.split(':', 1)
-                    if len(parts) > 1:
-                        current_bssid = parts[1].strip().lower()
-                elif 'Signal' in line or 'سیگنال' in line:
-                    parts = line.split(':', 1)
-                    if len(parts) > 1:
-                        try:
-                            signal_str = parts[1].strip().replace('%', '')
-                            current_signal = int(signal_str)
-                            if current_bssid:
-                                # Convert signal percentage to dBm (approximate)
-                                signal_dbm = int((current_signal / 2) - 100)
-                                wifi_networks.append({
-                                    "macAddress": current_bssid,
-                                    "signalStrength": signal_dbm
-                                })
-                        except:
-                            pass
+            wifi_networks = await NetworkManager.scan_wifi_networks()
             
             if len(wifi_networks) >= 2:
                 # Use Mozilla Location Service (free, no API key needed)
@@ -381,78 +575,91 @@ $watcher.Stop()
                     "wifiAccessPoints": wifi_networks[:10]  # Max 10 networks
                 }
                 
-                response = requests.post(
+                async with session.post(
                     "https://location.services.mozilla.com/v1/geolocate?key=test",
-                    json=payload,
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if "location" in data:
-                        lat = data["location"]["lat"]
-                        lon = data["location"]["lng"]
-                        accuracy = data.get("accuracy", 100)
-                        
-                        log.success(f"Wi-Fi Location: {lat}, {lon} (±{accuracy}m)")
-                        return {
-                            "lat": lat,
-                            "lon": lon,
-                            "accuracy": accuracy,
-                            "source": "Wi-Fi Networks (Precise)"
-                        }
+                    json=payload
+                ) as response:
+                    if response.status == 200:
+                        data = await response.json(content_type=None)
+                        if "location" in data:
+                            lat = data["location"]["lat"]
+                            lon = data["location"]["lng"]
+                            accuracy = data.get("accuracy", 100)
+                            
+                            log.success(f"Wi-Fi Location: {lat}, {lon} (±{accuracy}m)")
+                            return {
+                                "lat": lat,
+                                "lon": lon,
+                                "accuracy": accuracy,
+                                "source": "Wi-Fi Networks (Precise)"
+                            }
         except Exception as e:
             log.warning(f"Wi-Fi Location failed: {e}")
         return None
     
     @staticmethod
-    def get_location() -> Optional[Dict]:
-        """Get location - tries multiple methods for best accuracy"""
-        
-        precise_loc = None
-        
-        # Try Windows Location first (most accurate if GPS available)
-        win_loc = NetworkManager.get_windows_location()
-        if win_loc:
-            precise_loc = win_loc
-        
-        # Try Wi-Fi location as fallback (more accurate than IP)
-        if not precise_loc:
-            wifi_loc = NetworkManager.get_wifi_location()
-            if wifi_loc:
-                precise_loc = wifi_loc
-        
-        # Get IP-based location for additional info (city, country, etc.)
+    async def get_ip_location(session: aiohttp.ClientSession) -> Optional[Dict]:
+        """Get IP-based location info (city, country, ISP, ...)"""
         try:
-            response = requests.get(Config.LOCATION_API, timeout=10)
-            data = response.json()
+            async with session.get(Config.LOCATION_API) as response:
+                data = await response.json(content_type=None)
             
             if data.get("status") == "success":
-                result = {
-                    "ip": data.get("query", "Unknown"),
-                    "country": data.get("country", "Unknown"),
-                    "city": data.get("city", "Unknown"),
-                    "region": data.get("regionName", "Unknown"),
-                    "isp": data.get("isp", "Unknown"),
-                    "timezone": data.get("timezone", "Unknown"),
-                }
-                
-                # Use precise location if available
-                if precise_loc:
-                    result["lat"] = precise_loc["lat"]
-                    result["lon"] = precise_loc["lon"]
-                    result["accuracy"] = precise_loc.get("accuracy", 0)
-                    result["source"] = precise_loc["source"]
-                else:
-                    # Fall back to IP location (least accurate)
-                    result["lat"] = data.get("lat", 0)
-                    result["lon"] = data.get("lon", 0)
-                    result["source"] = "IP Address (Approximate ~1-5km)"
-                
-                return result
-                
+                return data
         except Exception as e:
             log.error(f"Location fetch failed: {e}")
+        return None
+    
+    @classmethod
+    async def get_location(cls, session: aiohttp.ClientSession) -> Optional[Dict]:
+        """Get location (cached for a few minutes)"""
+        now = time.monotonic()
+        if cls._loc_cache and now - cls._loc_cache[0] < Config.LOCATION_CACHE_TTL:
+            return cls._loc_cache[1]
+        
+        location = await cls._fetch_location(session)
+        if location:
+            cls._loc_cache = (time.monotonic(), location)
+        return location
+    
+    @staticmethod
+    async def _fetch_location(session: aiohttp.ClientSession) -> Optional[Dict]:
+        """Query all location sources concurrently and keep the most accurate"""
+        
+        # GPS, Wi-Fi and IP lookups run side by side; total latency is the slowest one
+        win_loc, wifi_loc, data = await asyncio.gather(
+            NetworkManager.get_windows_location(),
+            NetworkManager.get_wifi_location(session),
+            NetworkManager.get_ip_location(session),
+        )
+        
+        # Windows Location first (most accurate if GPS available), then Wi-Fi
+        precise_loc = win_loc or wifi_loc
+        
+        # IP-based location for additional info (city, country, etc.)
+        if data:
+            result = {
+                "ip": data.get("query", "Unknown"),
+                "country": data.get("country", "Unknown"),
+                "city": data.get("city", "Unknown"),
+                "region": data.get("regionName", "Unknown"),
+                "isp": data.get("isp", "Unknown"),
+                "timezone": data.get("timezone", "Unknown"),
+            }
+            
+            # Use precise location if available
+            if precise_loc:
+                result["lat"] = precise_loc["lat"]
+                result["lon"] = precise_loc["lon"]
+                result["accuracy"] = precise_loc.get("accuracy", 0)
+                result["source"] = precise_loc["source"]
+            else:
+                # Fall back to IP location (least accurate)
+                result["lat"] = data.get("lat", 0)
+                result["lon"] = data.get("lon", 0)
+                result["source"] = "IP Address (Approximate ~1-5km)"
+            
+            return result
         
         # If all else fails but we have precise location
         if precise_loc:
@@ -470,6 +677,15 @@ $watcher.Stop()
             }
         
         return None
+    
+    @staticmethod
+    def get_location_blocking() -> Optional[Dict]:
+        """Get location from a worker thread (runs its own loop and session)"""
+        async def fetch():
+            async with NetworkManager.create_session() as session:
+                return await NetworkManager.get_location(session)
+        
+        return asyncio.run(fetch())
 
 
 network = NetworkManager()
@@ -482,45 +698,130 @@ network = NetworkManager()
 class WebcamCapture:
     """Handles webcam capture operations"""
     
-    @staticmethod
-    def capture(save_path: Optional[Path] = None) -> Optional[Path]:
-        """Capture a single frame from webcam"""
-        try:
-            cap = cv2.VideoCapture(0)
-            
-            if not cap.isOpened():
-                log.error("Webcam not found or inaccessible")
-                return None
-            
-            # Warmup - let camera adjust
-            for _ in range(Config.CAMERA_WARMUP):
-                cap.read()
-                time.sleep(0.05)
-            
-            # Capture frame
-            ret, frame = cap.read()
+    # Opened lazily and reused for back-to-back shots, released once idle
+    _cap: Optional[cv2.VideoCapture] = None
+    _release_timer: Optional[threading.Timer] = None
+    _lock = threading.RLock()
+    
+    @classmethod
+    def _open(cls) -> Optional[cv2.VideoCapture]:
+        """Open and warm up the webcam, or return the already open device"""
+        if cls._cap is not None and cls._cap.isOpened():
+            return cls._cap
+        
+        # DirectShow opens much faster than the default MSMF backend
+        cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+        if not cap.isOpened():
             cap.release()
+            return None
+        
+        # Known-good mode skips driver renegotiation; a 1-frame buffer holds no stale frames
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, Config.CAMERA_WIDTH)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, Config.CAMERA_HEIGHT)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        
+        # Warmup - let camera adjust (grab() skips decoding; each call waits a frame)
+        end = time.monotonic() + Config.CAMERA_WARMUP
+        while time.monotonic() < end:
+            cap.grab()
+        
+        cls._cap = cap
+        return cap
+    
+    @classmethod
+    def release(cls):
+        """Release the webcam so other apps (and the camera LED) are freed"""
+        with cls._lock:
+            if cls._release_timer is not None:
+                cls._release_timer.cancel()
+                cls._release_timer = None
+            if cls._cap is not None:
+                cls._cap.release()
+                cls._cap = None
+    
+    @classmethod
+    def _schedule_release(cls):
+        """(Re)start the idle timer that releases the webcam"""
+        if cls._release_timer is not None:
+            cls._release_timer.cancel()
+        cls._release_timer = threading.Timer(Config.CAMERA_IDLE_RELEASE, cls.release)
+        cls._release_timer.daemon = True
+        cls._release_timer.start()
+    
+    @classmethod
+    def grab_frame(cls):
+        """Grab a single raw frame from webcam (blocking)"""
+        try:
+            with cls._lock:
+                cap = cls._open()
+                
+                if cap is None:
+                    log.error("Webcam not found or inaccessible")
+                    return None
+                
+                # Drop frames buffered since the last shot, decode only the last one
+                for _ in range(3):
+                    cap.grab()
+                ret, frame = cap.retrieve()
+                
+                if not ret or frame is None:
+                    # Device may have been unplugged - reopen on next capture
+                    cls.release()
+                    log.error("Failed to capture frame")
+                    return None
+                
+                cls._schedule_release()
+                return frame
             
-            if not ret or frame is None:
-                log.error("Failed to capture frame")
-                return None
-            
-            # Generate filename if not provided
-            if save_path is None:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                save_path = Config.CAPTURE_DIR / f"capture_{timestamp}.jpg"
-            
-            # Save image
-            cv2.imwrite(str(save_path), frame)
-            return save_path
-            
         except Exception as e:
             log.error(f"Capture error: {e}")
             return None
     
     @staticmethod
-    def startup_capture():
-        """Capture photos on system startup"""
+    def encode(frame) -> bytes:
+        """Encode a frame as JPEG in memory, downscaled for faster uploads"""
+        height, width = frame.shape[:2]
+        scale = Config.MAX_IMAGE_SIDE / max(height, width)
+        if scale < 1:
+            # INTER_AREA gives the cleanest result when shrinking
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        ok, buf = cv2.imencode(".jpg", frame, [
+            cv2.IMWRITE_JPEG_QUALITY, Config.JPEG_QUALITY,
+            cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+        ])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return buf.tobytes()
+    
+    @staticmethod
+    def save(data: bytes, save_path: Optional[Path] = None) -> Path:
+        """Store an encoded photo in the capture directory"""
+        # Generate filename if not provided
+        if save_path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            save_path = Config.CAPTURE_DIR / f"capture_{timestamp}.jpg"
+        
+        save_path.write_bytes(data)
+        return save_path
+    
+    @classmethod
+    def capture(cls, save_path: Optional[Path] = None) -> Optional[Path]:
+        """Capture a single frame from webcam and save it to disk"""
+        frame = cls.grab_frame()
+        if frame is None:
+            return None
+        
+        try:
+            return cls.save(cls.encode(frame), save_path)
+        except Exception as e:
+            log.error(f"Capture error: {e}")
+            return None
+    
+    @staticmethod
+    def startup_capture(stop: Optional[threading.Event] = None):
+        """Capture photos on system startup (ends early once stop is set)"""
+        stop = stop or threading.Event()
         print("\n" + "=" * 50)
         log.camera("Starting automatic capture sequence...")
         print("=" * 50 + "\n")
@@ -531,11 +832,16 @@ class WebcamCapture:
             width=30
         )
         
+        # One timestamp for the whole burst, photos are numbered
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
         captured = 0
         for i in range(Config.STARTUP_CAPTURES):
-            time.sleep(Config.CAPTURE_DELAY)
+            if stop.wait(Config.CAPTURE_DELAY):
+                log.warning("Capture sequence stopped")
+                return
             
-            photo = WebcamCapture.capture()
+            photo = WebcamCapture.capture(Config.CAPTURE_DIR / f"capture_{timestamp}_{i+1}.jpg")
             if photo:
                 captured += 1
                 log.success(f"Photo {i+1} saved: {photo.name}")
@@ -545,10 +851,12 @@ class WebcamCapture:
             progress.update()
         
         # Also save location
+        if stop.is_set():
+            log.warning("Capture sequence stopped")
+            return
         log.location("Fetching location data...")
-        location = network.get_location()
+        location = network.get_location_blocking()
         if location:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             loc_file = Config.CAPTURE_DIR / f"location_{timestamp}.json"
             with open(loc_file, 'w') as f:
                 json.dump(location, f, ensure_ascii=False, indent=2)
@@ -560,45 +868,25 @@ class WebcamCapture:
 
 
 webcam = WebcamCapture()
+atexit.register(WebcamCapture.release)
 
 
 # ============================================
-# TELEGRAM BOT HANDLERS
+# MESSAGE TEMPLATES
 # ============================================
 
-async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /start command with loading animation"""
-    storage.set_admin(update.effective_chat.id)
-    
-    # Animated startup
-    msg = await update.message.reply_text("🔐 *TeleGuard*\n\n⬜⬜⬜⬜⬜⬜⬜⬜⬜⬜ 0%", parse_mode="Markdown")
-    
-    stages = [
-        "🔐 *TeleGuard*\n\n🟩⬜⬜⬜⬜⬜⬜⬜⬜⬜ 10%\n\n_Initializing..._",
-        "🔐 *TeleGuard*\n\n🟩🟩🟩⬜⬜⬜⬜⬜⬜⬜ 30%\n\n_Loading modules..._",
-        "🔐 *TeleGuard*\n\n🟩🟩🟩🟩🟩⬜⬜⬜⬜⬜ 50%\n\n_Connecting..._",
-        "🔐 *TeleGuard*\n\n🟩🟩🟩🟩🟩🟩🟩⬜⬜⬜ 70%\n\n_Registering admin..._",
-        "🔐 *TeleGuard*\n\n🟩🟩🟩🟩🟩🟩🟩🟩🟩⬜ 90%\n\n_Almost ready..._",
-        "🔐 *TeleGuard*\n\n🟩🟩🟩🟩🟩🟩🟩🟩🟩🟩 100%\n\n✅ *Ready!*",
-    ]
-    
-    for stage in stages:
-        try:
-            await msg.edit_text(stage, parse_mode="Markdown")
-            await asyncio.sleep(0.3)
-        except:
-            pass
-    
-    await asyncio.sleep(0.5)
-    
-    keyboard = [
-        [InlineKeyboardButton("📷 Capture Photo", callback_data="capture")],
-        [InlineKeyboardButton("📍 Get Location", callback_data="location")],
-        [InlineKeyboardButton("📂 Pending Files", callback_data="pending")],
-        [InlineKeyboardButton("ℹ️ Status", callback_data="status")],
-    ]
-    
-    text = """
+MENU_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📷 Capture Photo", callback_data="capture")],
+    [InlineKeyboardButton("📍 Get Location", callback_data="location")],
+    [InlineKeyboardButton("📂 Pending Files", callback_data="pending")],
+    [InlineKeyboardButton("ℹ️ Status", callback_data="status")],
+])
+
+BACK_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔙 Back to Menu", callback_data="menu")]
+])
+
+START_TEXT = """
 🔐 *TeleGuard Security Bot*
 
 ✅ You are now registered as admin!
@@ -611,20 +899,10 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 Select an option below:
 """
-    
-    await msg.edit_text(
-        text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode="Markdown"
-    )
-    
-    # Send any pending files
-    await send_pending_files(context.application)
 
+MENU_TEXT = "🔐 *TeleGuard Menu*\n\nSelect an option:"
 
-async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /help command"""
-    text = """
+HELP_TEXT = """
 📖 *TeleGuard Help*
 
 *Commands:*
@@ -643,7 +921,58 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
 *Privacy:*
 All data is sent only to you (the admin).
 """
-    await update.message.reply_text(text, parse_mode="Markdown")
+
+# Progress stages are plain text - sent without parse_mode
+STAGES_CAPTURE = (
+    "📷 Initializing camera...\n\n🟩🟩⬜⬜⬜⬜⬜⬜⬜⬜",
+    "📷 Warming up...\n\n🟩🟩🟩🟩⬜⬜⬜⬜⬜⬜",
+    "📷 Capturing frame...\n\n🟩🟩🟩🟩🟩🟩⬜⬜⬜⬜",
+    "📷 Processing image...\n\n🟩🟩🟩🟩🟩🟩🟩🟩⬜⬜",
+)
+
+STAGES_LOCATION = (
+    "📍 Connecting to server...\n\n🟩🟩⬜⬜⬜⬜⬜⬜⬜⬜",
+    "📍 Getting IP address...\n\n🟩🟩🟩🟩⬜⬜⬜⬜⬜⬜",
+    "📍 Fetching geolocation...\n\n🟩🟩🟩🟩🟩🟩⬜⬜⬜⬜",
+    "📍 Processing data...\n\n🟩🟩🟩🟩🟩🟩🟩🟩⬜⬜",
+)
+
+# Startup alert pieces, filled with str.format
+ALERT_HEADER = """
+🚨 *STARTUP ALERT* 🚨
+
+🖥️ *Device has been turned ON!*
+🕐 *Time:* {time}
+
+"""
+
+ALERT_LOCATION = """📍 *Location:*
+🌐 IP: `{ip}`
+🏙️ City: {city}
+🏳️ Country: {country}
+📡 ISP: {isp}
+"""
+
+ALERT_FOOTER = "\n⚠️ *Check pending files for webcam captures!*"
+
+
+# ============================================
+# TELEGRAM BOT HANDLERS
+# ============================================
+
+async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /start command"""
+    storage.set_admin(update.effective_chat.id)
+    
+    await update.message.reply_text(START_TEXT, reply_markup=MENU_KEYBOARD, parse_mode="Markdown")
+    
+    # Send any pending files
+    await send_pending_files(context.application)
+
+
+async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /help command"""
+    await update.message.reply_text(HELP_TEXT, parse_mode="Markdown")
 
 
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -656,71 +985,59 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if action == "capture":
         await handle_capture(query)
     elif action == "location":
-        await handle_location(query)
+        await handle_location(query, context)
     elif action == "pending":
         await handle_pending(query, context)
     elif action == "status":
-        await handle_status(query)
+        await handle_status(query, context)
     elif action == "menu":
         await show_menu(query)
 
 
-async def handle_capture(query):
-    """Handle capture button with animated progress"""
-    
-    # Animated loading in Telegram with green squares
-    stages = [
-        "📷 *Initializing camera...*\n\n⬜⬜⬜⬜⬜⬜⬜⬜⬜⬜ 0%",
-        "📷 *Warming up...*\n\n🟩🟩⬜⬜⬜⬜⬜⬜⬜⬜ 20%",
-        "📷 *Adjusting focus...*\n\n🟩🟩🟩🟩⬜⬜⬜⬜⬜⬜ 40%",
-        "📷 *Capturing frame...*\n\n🟩🟩🟩🟩🟩🟩⬜⬜⬜⬜ 60%",
-        "📷 *Processing image...*\n\n🟩🟩🟩🟩🟩🟩🟩🟩⬜⬜ 80%",
-        "📷 *Saving photo...*\n\n🟩🟩🟩🟩🟩🟩🟩🟩🟩🟩 100%",
-    ]
-    
+async def animate_until_done(query, stages, task: asyncio.Task, delay: float = 0.3):
+    """Show progress stages while a task runs, stopping as soon as it finishes"""
     for stage in stages:
+        if task.done():
+            break
         try:
-            await query.edit_message_text(stage, parse_mode="Markdown")
-            await asyncio.sleep(0.3)
-        except:
+            await query.edit_message_text(stage, parse_mode=None)
+        except Exception:
             pass
+        await asyncio.wait({task}, timeout=delay)
+    return await task
+
+
+async def handle_capture(query):
+    """Handle capture button with progress shown while the camera works"""
     
-    photo = webcam.capture()
+    # Start the camera first; the animation only fills the wait
+    capture_task = asyncio.create_task(run_blocking(webcam.grab_frame))
+    frame = await animate_until_done(query, STAGES_CAPTURE, capture_task)
     
-    if photo:
-        await query.edit_message_text("📤 *Uploading...*\n\n🟩🟩🟩🟩🟩🟩🟩🟩🟩🟩 ✓", parse_mode="Markdown")
-        with open(photo, 'rb') as f:
+    if frame is not None:
+        # JPEG encoding is CPU work - keep it off the event loop
+        photo = await run_blocking(webcam.encode, frame)
+        try:
+            await query.edit_message_text("📤 *Uploading...*", parse_mode="Markdown")
             await query.message.reply_photo(
-                photo=f,
+                photo=photo,
                 caption=f"📷 *Captured Successfully!*\n🕐 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
                 parse_mode="Markdown"
             )
-        storage.delete_file(photo)
+        except Exception:
+            # Offline - keep the shot on disk for the next sync
+            await run_blocking(webcam.save, photo)
+            raise
         await query.edit_message_text("✅ *Photo captured and sent!*", parse_mode="Markdown", reply_markup=back_keyboard())
     else:
         await query.edit_message_text("❌ *Webcam not available*\n\nMake sure camera is connected.", parse_mode="Markdown", reply_markup=back_keyboard())
 
 
-async def handle_location(query):
-    """Handle location button with animated progress"""
+async def handle_location(query, context):
+    """Handle location button with progress shown while the lookup runs"""
     
-    # Animated loading with green squares
-    stages = [
-        "📍 *Connecting to server...*\n\n⬜⬜⬜⬜⬜⬜⬜⬜⬜⬜ 0%",
-        "📍 *Getting IP address...*\n\n🟩🟩🟩⬜⬜⬜⬜⬜⬜⬜ 30%",
-        "📍 *Fetching geolocation...*\n\n🟩🟩🟩🟩🟩🟩⬜⬜⬜⬜ 60%",
-        "📍 *Processing data...*\n\n🟩🟩🟩🟩🟩🟩🟩🟩🟩⬜ 90%",
-        "📍 *Complete!*\n\n🟩🟩🟩🟩🟩🟩🟩🟩🟩🟩 100%",
-    ]
-    
-    for stage in stages:
-        try:
-            await query.edit_message_text(stage, parse_mode="Markdown")
-            await asyncio.sleep(0.25)
-        except:
-            pass
-    
-    info = network.get_location()
+    location_task = asyncio.create_task(network.get_location(context.bot_data['http']))
+    info = await animate_until_done(query, STAGES_LOCATION, location_task)
     
     if info:
         text = f"""
@@ -744,7 +1061,7 @@ async def handle_location(query):
 
 
 async def handle_pending(query, context):
-    """Handle pending files button with progress"""
+    """Handle pending files button"""
     files = storage.get_pending_files()
     
     if not files:
@@ -752,24 +1069,7 @@ async def handle_pending(query, context):
         return
     
     total = len(files)
-    
-    # Show progress for each file
-    for i, filepath in enumerate(files):
-        percent = int((i / total) * 100)
-        filled = int(percent / 10)
-        bar = "█" * filled + "░" * (10 - filled)
-        
-        try:
-            await query.edit_message_text(
-                f"📤 *Sending files...*\n\n"
-                f"File {i+1}/{total}: `{filepath.name}`\n\n"
-                f"`[{bar}]` {percent}%",
-                parse_mode="Markdown"
-            )
-        except:
-            pass
-        
-        await asyncio.sleep(0.2)
+    await query.edit_message_text(f"📤 *Sending {total} files...*", parse_mode="Markdown")
     
     await send_pending_files(context.application)
     await query.edit_message_text(
@@ -779,16 +1079,17 @@ async def handle_pending(query, context):
     )
 
 
-async def handle_status(query):
+async def handle_status(query, context):
     """Handle status button"""
-    files = storage.get_pending_files()
-    internet = "✅ Connected" if network.check_internet() else "❌ Disconnected"
+    pending = storage.pending_count()
+    online = await network.check_internet(context.bot_data['http'])
+    internet = "✅ Connected" if online else "❌ Disconnected"
     
     text = f"""
 ℹ️ *System Status*
 
 🌐 *Internet:* {internet}
-📂 *Pending files:* {len(files)}
+📂 *Pending files:* {pending}
 👤 *Admin ID:* `{storage.admin_id}`
 📁 *Capture dir:* `{Config.CAPTURE_DIR.name}/`
 """
@@ -797,24 +1098,12 @@ async def handle_status(query):
 
 async def show_menu(query):
     """Show main menu"""
-    keyboard = [
-        [InlineKeyboardButton("📷 Capture Photo", callback_data="capture")],
-        [InlineKeyboardButton("📍 Get Location", callback_data="location")],
-        [InlineKeyboardButton("📂 Pending Files", callback_data="pending")],
-        [InlineKeyboardButton("ℹ️ Status", callback_data="status")],
-    ]
-    await query.edit_message_text(
-        "🔐 *TeleGuard Menu*\n\nSelect an option:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode="Markdown"
-    )
+    await query.edit_message_text(MENU_TEXT, reply_markup=MENU_KEYBOARD, parse_mode="Markdown")
 
 
 def back_keyboard():
-    """Create back to menu keyboard"""
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("🔙 Back to Menu", callback_data="menu")]
-    ])
+    """Back to menu keyboard"""
+    return BACK_KEYBOARD
 
 
 async def send_pending_files(app):
@@ -823,57 +1112,103 @@ async def send_pending_files(app):
         log.warning("No admin registered, skipping file sync")
         return
     
+    # Handlers run concurrently - never sync the same files twice
+    async with app.bot_data['send_lock']:
+        await _send_pending_files(app)
+
+
+async def _send_pending_files(app):
+    """Send pending files (caller holds the send lock)"""
     files = storage.get_pending_files()
     if not files:
         return
     
     log.telegram(f"Sending {len(files)} pending files...")
     
-    for filepath in files:
-        try:
-            if filepath.suffix == ".jpg":
-                with open(filepath, 'rb') as f:
-                    await app.bot.send_photo(
-                        chat_id=storage.admin_id,
-                        photo=f,
+    semaphore = asyncio.Semaphore(Config.SEND_CONCURRENCY)
+    photos = sorted(f for f in files if f.suffix == ".jpg")  # chronological albums
+    locations = [f for f in files if f.suffix == ".json"]
+    
+    async def send_photos(batch: List[Path]):
+        """Upload up to MEDIA_GROUP_LIMIT photos in a single request"""
+        async with semaphore:
+            try:
+                media, digests = [], []
+                for filepath in batch:
+                    async with aiofiles.open(filepath, 'rb') as f:
+                        data = await f.read()
+                    digest = storage.file_digest(data)
+                    digests.append(digest)
+                    # Already uploaded once (e.g. delete failed last time) - reuse file_id
+                    media.append(InputMediaPhoto(
+                        media=storage.get_file_id(digest) or data,
                         caption=f"📷 *Auto-capture*\n📁 `{filepath.name}`",
                         parse_mode="Markdown"
-                    )
-            elif filepath.suffix == ".json" and "location" in filepath.name:
-                with open(filepath, 'r') as f:
-                    info = json.load(f)
+                    ))
+                
+                # Albums need at least two items
+                if len(media) == 1:
+                    messages = [await flood_safe(
+                        app.bot.send_photo,
+                        chat_id=storage.admin_id,
+                        photo=media[0].media,
+                        caption=media[0].caption,
+                        parse_mode="Markdown"
+                    )]
+                else:
+                    messages = await flood_safe(app.bot.send_media_group, chat_id=storage.admin_id, media=media)
+                
+                for filepath, digest, message in zip(batch, digests, messages):
+                    if await run_blocking(storage.delete_file, filepath):
+                        storage.forget_file_id(digest)
+                    elif message.photo:
+                        storage.remember_file_id(digest, message.photo[-1].file_id)
+                    log.success(f"Sent: {filepath.name}")
+                
+            except Exception as e:
+                log.error(f"Failed to send {', '.join(f.name for f in batch)}: {e}")
+    
+    async def send_location(filepath: Path):
+        async with semaphore:
+            try:
+                async with aiofiles.open(filepath, 'r') as f:
+                    info = json.loads(await f.read())
                 
                 text = f"📍 *Saved Location*\n🌐 IP: `{info.get('ip')}`\n🏙️ {info.get('city')}, {info.get('country')}"
-                await app.bot.send_message(
+                await flood_safe(
+                    app.bot.send_message,
                     chat_id=storage.admin_id,
                     text=text,
                     parse_mode="Markdown"
                 )
                 
                 if info.get('lat') and info.get('lon'):
-                    await app.bot.send_location(
+                    await flood_safe(
+                        app.bot.send_location,
                         chat_id=storage.admin_id,
                         latitude=info['lat'],
                         longitude=info['lon']
                     )
-            
-            storage.delete_file(filepath)
-            log.success(f"Sent: {filepath.name}")
-            
-        except Exception as e:
-            log.error(f"Failed to send {filepath.name}: {e}")
+                
+                await run_blocking(storage.delete_file, filepath)
+                log.success(f"Sent: {filepath.name}")
+                
+            except Exception as e:
+                log.error(f"Failed to send {filepath.name}: {e}")
+    
+    # Up to SEND_CONCURRENCY requests in flight; a RetryAfter backs off once
+    limit = Config.MEDIA_GROUP_LIMIT
+    await asyncio.gather(
+        *(send_photos(photos[i:i + limit]) for i in range(0, len(photos), limit)),
+        *(send_location(filepath) for filepath in locations)
+    )
 
 
 # ============================================
 # MAIN APPLICATION
 # ============================================
 
-def print_banner():
-    """Print startup banner (safe for noconsole mode)"""
-    if sys.stdout is None:
-        return
-    try:
-        banner = """
+_BANNER = """
 ==============================================================
                                                               
    TELEGUARD - Telegram Security Bot v1.0.0                  
@@ -882,14 +1217,53 @@ def print_banner():
    Webcam Capture    |    Location Tracking                  
    Offline Storage   |    Telegram Alerts                    
 ==============================================================
-        """
-        print(banner)
-    except:
-        pass
+        
+"""
+
+
+def print_banner():
+    """Print startup banner (safe for noconsole mode)"""
+    if sys.stdout is not None:
+        sys.stdout.write(_BANNER)
+
+
+# (application, loop) of the bot currently in run_polling(), for request_stop()
+_running = None
+# Whether _raise_stop() already fired for the current run (loop thread only)
+_stop_raised = False
+# Ends the current run's startup capture burst; the pool's workers are not
+# daemons, so an unfinished burst would otherwise hold up exit
+_capture_stop = threading.Event()
+
+
+def _raise_stop():
+    """Stop run_polling() from inside its loop, whatever phase it is in"""
+    global _stop_raised
+    # stop_running() is a no-op until start() has finished, so use the same
+    # SystemExit that PTB's own signal handlers raise - run_polling() catches
+    # it in every phase and then shuts down normally
+    if not _stop_raised:
+        _stop_raised = True
+        raise SystemExit
+
+
+def request_stop():
+    """Stop a bot started with main() - safe to call from any thread"""
+    _capture_stop.set()
+    running = _running
+    if running is not None:
+        try:
+            running[1].call_soon_threadsafe(_raise_stop)
+        except RuntimeError:
+            pass  # loop already closed - the run is over
 
 
-def main():
-    """Main entry point"""
+def main(stop_event: Optional[threading.Event] = None):
+    """Main entry point (also run on a worker thread by the control panel)"""
+    # stop_event is set by the caller before request_stop(), so a stop asked
+    # for before this run reaches run_polling() is not lost
+    global _running, _stop_raised, _capture_stop
+    
     print_banner()
     
     # Load configuration from config.txt
@@ -913,26 +1287,30 @@ def main():
     
     log.success(f"Config loaded! Admin ID: {Config.ADMIN_ID}")
     
-    # Set admin from config
-    storage.admin_id = Config.ADMIN_ID
-    storage.save_config()
-    
-    # Initialize
-    ProgressBar.spinner("Initializing...", 1.0)
-    Config.ensure_dirs()
-    
-    # Startup capture in background thread
-    capture_thread = threading.Thread(target=webcam.startup_capture, daemon=True)
-    capture_thread.start()
+    # Set admin from config (config.json is only rewritten when it changes)
+    if storage.admin_id != Config.ADMIN_ID:
+        storage.admin_id = Config.ADMIN_ID
+        storage.save_config()
     
     # Build Telegram application
     log.telegram("Connecting to Telegram...")
     app = Application.builder().token(Config.BOT_TOKEN).build()
     
-    # Register handlers
-    app.add_handler(CommandHandler("start", cmd_start))
-    app.add_handler(CommandHandler("help", cmd_help))
-    app.add_handler(CallbackQueryHandler(button_callback))
+    # Fresh loop per run - works on the main thread and on worker threads
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    
+    # Startup capture runs on the worker pool while the bot connects
+    # (not in post_init: that only runs once Telegram is reachable)
+    _capture_stop = capture_stop = threading.Event()
+    if stop_event is not None and stop_event.is_set():
+        capture_stop.set()
+    _POOL.submit(webcam.startup_capture, capture_stop)
+    
+    # Register handlers (block=False: each update runs in its own task)
+    app.add_handler(CommandHandler("start", cmd_start, block=False))
+    app.add_handler(CommandHandler("help", cmd_help, block=False))
+    app.add_handler(CallbackQueryHandler(button_callback, block=False))
     
     # Send startup alert
     async def send_startup_alert(application):
@@ -942,37 +1320,26 @@ def main():
             return
         
         log.telegram("Sending startup alert...")
+        session = application.bot_data['http']
         
-        # Wait for internet
-        attempts = 0
-        while not network.check_internet() and attempts < 30:
-            time.sleep(2)
-            attempts += 1
-        
-        if not network.check_internet():
+        # Wait for internet without blocking the event loop
+        if not await network.wait_for_internet():
             log.error("No internet connection for alert")
             return
         
-        # Get location
-        location = network.get_location()
+        # Get location in the background while the alert is prepared
+        location_task = asyncio.create_task(network.get_location(session))
         
         # Build alert message
-        alert = f"""
-🚨 *STARTUP ALERT* 🚨
-
-🖥️ *Device has been turned ON!*
-🕐 *Time:* {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-"""
+        parts = [ALERT_HEADER.format(time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))]
+        location = await location_task
         if location:
-            alert += f"""📍 *Location:*
-🌐 IP: `{location['ip']}`
-🏙️ City: {location['city']}
-🏳️ Country: {location['country']}
-📡 ISP: {location['isp']}
-"""
-        
-        alert += "\n⚠️ *Check pending files for webcam captures!*"
+            parts.append(ALERT_LOCATION.format(
+                ip=location['ip'], city=location['city'],
+                country=location['country'], isp=location['isp']
+            ))
+        parts.append(ALERT_FOOTER)
+        alert = "".join(parts)
         
         try:
             await application.bot.send_message(
@@ -997,14 +1364,58 @@ def main():
         except Exception as e:
             log.error(f"Failed to send startup alert: {e}")
     
+    async def on_startup(application):
+        """Open the shared HTTP session, then send the startup alert"""
+        application.bot_data['http'] = network.create_session()
+        application.bot_data['send_lock'] = asyncio.Lock()
+        # As a task: polling starts right away instead of after the internet wait.
+        # asyncio.create_task, not application.create_task - the app is not
+        # running yet, so PTB would neither track nor await it; on_stop does
+        application.bot_data['startup_alert'] = asyncio.create_task(send_startup_alert(application))
+    
+    async def on_stop(application):
+        """Cancel a startup alert still in flight before the session closes"""
+        task = application.bot_data.pop('startup_alert', None)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    async def on_shutdown(application):
+        """Close the shared HTTP session"""
+        session = application.bot_data.get('http')
+        if session:
+            await session.close()
+    
     # Add post_init to send alert
-    app.post_init = send_startup_alert
+    app.post_init = on_startup
+    app.post_stop = on_stop
+    app.post_shutdown = on_shutdown
     
     # Start bot
     log.success("Bot is now running!")
     log.info("Press Ctrl+C to stop\n")
     
-    app.run_polling(allowed_updates=["message", "callback_query"])
+    # Long polling: one getUpdates request is held open for up to 30s while idle;
+    # updates queued while the device was off are skipped
+    # Signal handlers can only be installed on the main thread
+    extra = {} if threading.current_thread() is threading.main_thread() else {"stop_signals": None}
+    
+    _stop_raised = False
+    _running = (app, loop)
+    if stop_event is not None and stop_event.is_set():
+        # Stopped before request_stop() could see this run
+        loop.call_soon(_raise_stop)
+    try:
+        app.run_polling(
+            allowed_updates=["message", "callback_query"],
+            timeout=30,
+            poll_interval=0.0,
+            drop_pending_updates=True,
+            **extra
+        )
+    finally:
+        _running = None
+        capture_stop.set()
 
 
 if __name__ == "__main__":
@@ -2,13 +2,215 @@
 TeleGuard Control Panel - Modern Beautiful UI with CustomTkinter
 """
 
-import customtkinter as ctk
+import functools
+import importlib.util
+import shutil
+import signal
 import subprocess
+import threading
 import os
 import sys
 from pathlib import Path
 import json
 
+# orjson is optional - its output is compatible with the json fallback below
+# (both parse each other's files), though not byte-identical
+try:
+    import orjson
+    _json_loads, _json_dumps = orjson.loads, orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    def _json_dumps(obj):
+        return json.dumps(obj).encode()
+
+
+@functools.lru_cache(maxsize=1)
+def cscript_path():
+    """cscript.exe, looked up on first use; None when Windows Script Host is missing/disabled"""
+    return shutil.which("cscript")
+
+
+# Parsed state.json, reused until the file's mtime changes
+_state_cache = {'mtime': None, 'data': {}}
+
+
+def read_state(state_file):
+    """Read state.json (cached by mtime)"""
+    try:
+        mtime = os.stat(state_file).st_mtime_ns
+    except OSError:
+        return {}
+    
+    if _state_cache['mtime'] != mtime:
+        try:
+            data = _json_loads(state_file.read_bytes())
+        except:
+            data = {}
+        _state_cache['mtime'] = mtime
+        _state_cache['data'] = data
+    return _state_cache['data']
+
+
+def write_state(state_file, state):
+    """Write state.json atomically (temp file + rename) and refresh the cache"""
+    tmp_file = state_file.with_suffix(".json.tmp")
+    tmp_file.write_bytes(_json_dumps(state))
+    os.replace(tmp_file, state_file)
+    _state_cache['mtime'] = os.stat(state_file).st_mtime_ns
+    _state_cache['data'] = state
+
+
+def update_state(state_file, **changes):
+    """Merge changes into state.json, keeping the other keys"""
+    write_state(state_file, dict(read_state(state_file), **changes))
+
+
+def process_start_time(pid):
+    """Creation time of a live process (FILETIME ticks), None if unknown/gone"""
+    if os.name != 'nt':
+        return None
+    import ctypes
+    from ctypes import wintypes
+    
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.GetProcessTimes.argtypes = (wintypes.HANDLE,) + (ctypes.POINTER(wintypes.FILETIME),) * 4
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return None
+    try:
+        times = [wintypes.FILETIME() for _ in range(4)]
+        if not kernel32.GetProcessTimes(handle, *(ctypes.byref(t) for t in times)):
+            return None
+        return (times[0].dwHighDateTime << 32) | times[0].dwLowDateTime
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def stop_other_instance(state_file):
+    """Terminate a bot left running by another TeleGuard process (by its stored PID)"""
+    state = read_state(state_file)
+    pid = state.get('pid')
+    if not pid or pid == os.getpid():
+        return
+    
+    # The PID may be stale (process killed hard, PID reused by Windows):
+    # only kill it if its creation time still matches the one we stored
+    started = state.get('pid_started')
+    if started is not None and process_start_time(pid) == started:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass  # already gone
+    try:
+        update_state(state_file, pid=None, pid_started=None)
+    except OSError:
+        pass
+
+
+def load_bot_module(base_path):
+    """Import bot.py from base_path once and reuse it afterwards"""
+    if "bot" in sys.modules:
+        return sys.modules["bot"]
+    
+    bot_py = base_path / "bot.py"
+    if not bot_py.exists():
+        return None
+    
+    # Add base_path to sys.path
+    if str(base_path) not in sys.path:
+        sys.path.insert(0, str(base_path))
+    
+    # Load bot.py as a module
+    spec = importlib.util.spec_from_file_location("bot", bot_py)
+    bot_module = importlib.util.module_from_spec(spec)
+    sys.modules["bot"] = bot_module
+    try:
+        spec.loader.exec_module(bot_module)
+    except:
+        del sys.modules["bot"]
+        raise
+    return bot_module
+
+
+def log_error(base_path, message):
+    """Append to error.log since there is no console"""
+    try:
+        from datetime import datetime
+        with open(base_path / "error.log", 'a') as f:
+            f.write(f"[{datetime.now()}] {message}\n")
+    except:
+        pass
+
+
+def run_bot(bot_module, base_path, stop_event=None):
+    """Run bot.main() until it stops, with this process's PID in state.json"""
+    state_file = base_path / "state.json"
+    pid = os.getpid()
+    try:
+        # Creation time identifies this process even after the PID is reused
+        update_state(state_file, pid=pid, pid_started=process_start_time(pid))
+    except OSError:
+        pass
+    
+    try:
+        if stop_event is not None:
+            bot_module.main(stop_event)
+        else:
+            bot_module.main()
+    except SystemExit:
+        pass
+    except Exception as e:
+        # Log error to file since we have no console
+        log_error(base_path, f"Bot error: {e}")
+    finally:
+        try:
+            if read_state(state_file).get('pid') == pid:
+                update_state(state_file, pid=None, pid_started=None)
+        except OSError:
+            pass
+
+
+def run_hidden_bot():
+    """Run just the bot without any UI when in hidden startup mode"""
+    if getattr(sys, 'frozen', False):
+        base_path = Path(sys.executable).parent
+    else:
+        base_path = Path(__file__).parent
+    
+    state_file = base_path / "state.json"
+    
+    # Check if protection is enabled
+    is_running = read_state(state_file).get('running', False)
+    
+    # If not enabled, just exit silently
+    if not is_running:
+        return
+    
+    # Import and run bot as a proper module
+    try:
+        bot_module = load_bot_module(base_path)
+    except Exception as e:
+        # Log error to file since we have no console
+        log_error(base_path, f"Bot error: {e}")
+        return
+    
+    # Run main function
+    if bot_module and hasattr(bot_module, 'main'):
+        run_bot(bot_module, base_path)
+
+
+# Hidden startup only needs the bot - dispatch before the GUI stack is imported
+if __name__ == "__main__" and "--hidden" in sys.argv:
+    run_hidden_bot()
+    sys.exit(0)
+
+
+import customtkinter as ctk
 
 # Set appearance
 ctk.set_appearance_mode("dark")
@@ -21,15 +223,8 @@ class TeleGuardApp(ctk.CTk):
         
         # Window setup
         self.title("TeleGuard")
-        self.geometry("420x580")
         self.resizable(False, False)
         
-        # Center window
-        self.update_idletasks()
-        x = (self.winfo_screenwidth() - 420) // 2
-        y = (self.winfo_screenheight() - 580) // 2
-        self.geometry(f"420x580+{x}+{y}")
-        
         # Get base path
         if getattr(sys, 'frozen', False):
             self.base_path = Path(sys.executable).parent
@@ -47,7 +242,9 @@ class TeleGuardApp(ctk.CTk):
         # State
         self.state_file = self.base_path / "state.json"
         self.is_running = self.load_state()
-        self.bot_process = None
+        self.bot_thread = None
+        self.bot_stop = None  # threading.Event of the current bot thread
+        self.restart_pending = False
         self.start_hidden = start_hidden
         
         # If started hidden (from startup) and protection is OFF, just exit
@@ -62,6 +259,12 @@ class TeleGuardApp(ctk.CTk):
             # Keep running in background - no mainloop needed for hidden mode
             return
         
+        # Center window (only when it will actually be shown)
+        self.update_idletasks()
+        x = (self.winfo_screenwidth() - 420) // 2
+        y = (self.winfo_screenheight() - 580) // 2
+        self.geometry(f"420x580+{x}+{y}")
+        
         # Normal mode - create UI
         self.create_ui()
         
@@ -70,22 +273,30 @@ class TeleGuardApp(ctk.CTk):
             self.start_protection()
     
     def load_state(self):
-        try:
-            if self.state_file.exists():
-                with open(self.state_file, 'r') as f:
-                    return json.load(f).get('running', False)
-        except:
-            pass
-        return False
+        return read_state(self.state_file).get('running', False)
     
     def save_state(self):
+        state = read_state(self.state_file)
+        if state.get('running') == self.is_running:
+            return
+        
+        state = dict(state, running=self.is_running)
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump({'running': self.is_running}, f)
+            write_state(self.state_file, state)
         except:
             pass
     
     def create_ui(self):
+        # Fonts, built once and shared by every widget of the same style
+        font_eye = ctk.CTkFont(size=48)
+        font_title = ctk.CTkFont(family="Segoe UI", size=32, weight="bold")
+        font_heading = ctk.CTkFont(size=16, weight="bold")
+        font_card_title = ctk.CTkFont(size=14, weight="bold")
+        font_icon = ctk.CTkFont(size=16)
+        font_body = ctk.CTkFont(size=13)
+        font_small = ctk.CTkFont(size=12)
+        font_footer = ctk.CTkFont(size=11)
+        
         # Main container with gradient background
         self.configure(fg_color=("#0f0f0f", "#0f0f0f"))
         
@@ -102,7 +313,7 @@ class TeleGuardApp(ctk.CTk):
         self.eye_button = ctk.CTkButton(
             icon_frame,
             text="👁",
-            font=ctk.CTkFont(size=48),
+            font=font_eye,
             width=100, height=100,
             corner_radius=50,
             fg_color=self.eye_color,
@@ -115,7 +326,7 @@ class TeleGuardApp(ctk.CTk):
         title = ctk.CTkLabel(
             header,
             text="TeleGuard",
-            font=ctk.CTkFont(family="Segoe UI", size=32, weight="bold"),
+            font=font_title,
             text_color="white"
         )
         title.pack(pady=(25, 5))
@@ -124,7 +335,7 @@ class TeleGuardApp(ctk.CTk):
         subtitle = ctk.CTkLabel(
             header,
             text="Security Monitoring System",
-            font=ctk.CTkFont(size=13),
+            font=font_body,
             text_color="#666666"
         )
         subtitle.pack()
@@ -143,7 +354,7 @@ class TeleGuardApp(ctk.CTk):
         switch_label = ctk.CTkLabel(
             switch_inner,
             text="Protection",
-            font=ctk.CTkFont(size=16, weight="bold"),
+            font=font_heading,
             text_color="white"
         )
         switch_label.pack(side="left")
@@ -174,7 +385,7 @@ class TeleGuardApp(ctk.CTk):
         self.status_label = ctk.CTkLabel(
             switch_card,
             text=f"Status: {status_text}",
-            font=ctk.CTkFont(size=12),
+            font=font_small,
             text_color=status_color
         )
         self.status_label.pack(pady=(0, 15))
@@ -186,7 +397,7 @@ class TeleGuardApp(ctk.CTk):
         features_header = ctk.CTkLabel(
             features_card,
             text="Features",
-            font=ctk.CTkFont(size=14, weight="bold"),
+            font=font_card_title,
             text_color="#888888"
         )
         features_header.pack(anchor="w", padx=25, pady=(20, 15))
@@ -205,11 +416,11 @@ class TeleGuardApp(ctk.CTk):
             left = ctk.CTkFrame(row, fg_color="transparent")
             left.pack(side="left")
             
-            ctk.CTkLabel(left, text=icon, font=ctk.CTkFont(size=16)).pack(side="left", padx=(0, 10))
-            ctk.CTkLabel(left, text=name, font=ctk.CTkFont(size=13), 
+            ctk.CTkLabel(left, text=icon, font=font_icon).pack(side="left", padx=(0, 10))
+            ctk.CTkLabel(left, text=name, font=font_body, 
                         text_color="white").pack(side="left")
             
-            ctk.CTkLabel(row, text=status, font=ctk.CTkFont(size=12),
+            ctk.CTkLabel(row, text=status, font=font_small,
                         text_color="#00d4aa").pack(side="right")
         
         # Spacer
@@ -222,7 +433,7 @@ class TeleGuardApp(ctk.CTk):
         version = ctk.CTkLabel(
             footer,
             text="TeleGuard v1.0",
-            font=ctk.CTkFont(size=11),
+            font=font_footer,
             text_color="#444444"
         )
         version.pack()
@@ -248,50 +459,64 @@ class TeleGuardApp(ctk.CTk):
         self.status_label.configure(text=f"Status: {status_text}", text_color=status_color)
     
     def start_protection(self):
-        """Start the bot as a background process"""
-        # Find bot.py in same directory
-        bot_py = self.base_path / "bot.py"
+        """Start the bot on a background thread"""
+        if self.bot_thread and self.bot_thread.is_alive():
+            # Still shutting down (stop() waits for the bot's running tasks):
+            # start again once the old thread has exited
+            if self.bot_stop.is_set() and not self.restart_pending:
+                self.restart_pending = True
+                self.after(250, self.restart_when_stopped)
+            # Otherwise already polling
+            self.update_startup_shortcut(enabled=True)
+            return
         
-        if bot_py.exists():
-            # Run bot.py with Python
-            try:
-                self.bot_process = subprocess.Popen(
-                    ['pythonw', str(bot_py)],
-                    cwd=str(self.base_path),
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-            except:
-                try:
-                    # Fallback to python if pythonw not available
-                    self.bot_process = subprocess.Popen(
-                        ['python', str(bot_py)],
-                        cwd=str(self.base_path),
-                        creationflags=subprocess.CREATE_NO_WINDOW
-                    )
-                except:
-                    pass
+        try:
+            bot_module = load_bot_module(self.base_path)
+        except Exception as e:
+            log_error(self.base_path, f"Bot error: {e}")
+            bot_module = None
+        
+        if bot_module and hasattr(bot_module, 'main'):
+            # Only one process may poll Telegram - take over from a hidden instance
+            stop_other_instance(self.state_file)
+            
+            # Not a daemon: like the old pythonw process, the bot keeps
+            # running after the window is closed
+            self.bot_stop = threading.Event()
+            self.bot_thread = threading.Thread(
+                target=run_bot, args=(bot_module, self.base_path, self.bot_stop), name="TeleGuardBot"
+            )
+            self.bot_thread.start()
         
         # Add/update startup shortcut with --hidden flag
         self.update_startup_shortcut(enabled=True)
     
+    def restart_when_stopped(self):
+        """Start the bot again once the previous thread has finished stopping"""
+        if not self.is_running:
+            # Switched off again meanwhile
+            self.restart_pending = False
+        elif self.bot_thread.is_alive():
+            self.after(250, self.restart_when_stopped)
+        else:
+            self.restart_pending = False
+            self.start_protection()
+    
     def stop_protection(self):
         """Stop the bot and remove from startup"""
-        # Kill the bot process
+        # Ask the bot's loop to stop polling; the thread then exits on its own.
+        # The event covers a bot that has not reached run_polling() yet.
+        if self.bot_stop is not None:
+            self.bot_stop.set()
         try:
-            if hasattr(self, 'bot_process') and self.bot_process:
-                self.bot_process.terminate()
+            bot_module = sys.modules.get("bot")
+            if bot_module and hasattr(bot_module, 'request_stop'):
+                bot_module.request_stop()
         except:
             pass
         
-        # Also kill any running pythonw with bot.py
-        try:
-            subprocess.run(
-                ['taskkill', '/F', '/IM', 'pythonw.exe'],
-                capture_output=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-        except:
-            pass
+        # A bot started by an earlier panel or at Windows startup
+        stop_other_instance(self.state_file)
         
         # Remove from startup
         self.update_startup_shortcut(enabled=False)
@@ -304,7 +529,24 @@ class TeleGuardApp(ctk.CTk):
         
         if enabled and exe_path.exists():
             try:
-                # Create shortcut with --hidden argument
+                # Create shortcut with --hidden argument, in-process via COM
+                import win32com.client
+                shell = win32com.client.Dispatch("WScript.Shell")
+                sc = shell.CreateShortCut(str(shortcut))
+                sc.TargetPath = str(exe_path)
+                sc.Arguments = "--hidden"
+                sc.WorkingDirectory = str(self.base_path)
+                sc.WindowStyle = 7
+                sc.save()
+                return
+            except:
+                pass  # pywin32 not available - fall back to VBScript
+            
+            cscript = cscript_path()
+            if cscript is None:
+                return
+            
+            try:
                 vbs = f'''Set WshShell = CreateObject("WScript.Shell")
 Set Shortcut = WshShell.CreateShortcut("{shortcut}")
 Shortcut.TargetPath = "{exe_path}"
@@ -316,7 +558,7 @@ Shortcut.Save'''
                 vbs_file = Path(os.environ['TEMP']) / "_tg.vbs"
                 with open(vbs_file, 'w') as f:
                     f.write(vbs)
-                subprocess.run(['cscript', '//nologo', str(vbs_file)],
+                subprocess.run([cscript, '//nologo', str(vbs_file)],
                               capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW)
                 vbs_file.unlink(missing_ok=True)
             except:
@@ -330,66 +572,9 @@ Shortcut.Save'''
                 pass
 
 
-def run_hidden_bot():
-    """Run just the bot without any UI when in hidden startup mode"""
-    import importlib.util
-    
-    if getattr(sys, 'frozen', False):
-        base_path = Path(sys.executable).parent
-    else:
-        base_path = Path(__file__).parent
-    
-    state_file = base_path / "state.json"
-    
-    # Check if protection is enabled
-    try:
-        if state_file.exists():
-            with open(state_file, 'r') as f:
-                is_running = json.load(f).get('running', False)
-        else:
-            is_running = False
-    except:
-        is_running = False
-    
-    # If not enabled, just exit silently
-    if not is_running:
-        return
-    
-    # Import and run bot as a proper module
-    bot_py = base_path / "bot.py"
-    if bot_py.exists():
-        try:
-            # Add base_path to sys.path
-            if str(base_path) not in sys.path:
-                sys.path.insert(0, str(base_path))
-            
-            # Load bot.py as a module
-            spec = importlib.util.spec_from_file_location("bot", bot_py)
-            bot_module = importlib.util.module_from_spec(spec)
-            sys.modules["bot"] = bot_module
-            spec.loader.exec_module(bot_module)
-            
-            # Run main function
-            if hasattr(bot_module, 'main'):
-                bot_module.main()
-                
-        except Exception as e:
-            # Log error to file since we have no console
-            try:
-                from datetime import datetime
-                with open(base_path / "error.log", 'a') as f:
-                    f.write(f"[{datetime.now()}] Bot error: {e}\n")
-            except:
-                pass
-
-
 if __name__ == "__main__":
-    # Check for --hidden argument (used when starting from Windows startup)
-    if "--hidden" in sys.argv:
-        run_hidden_bot()
-        # run_hidden_bot runs the bot directly, it only returns if there's an error
-    else:
-        app = TeleGuardApp()
-        app.mainloop()
+    # --hidden (used when starting from Windows startup) was handled above
+    app = TeleGuardApp()
+    app.mainloop()
 
 
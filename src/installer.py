@@ -3,12 +3,15 @@ TeleGuard Installer - Beautiful Modern UI with CustomTkinter
 """
 
 import customtkinter as ctk
+import tkinter as tk
 import subprocess
 import os
 import sys
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import threading
-import time
+import queue
 
 
 # Set appearance
@@ -16,6 +19,105 @@ ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
 
+# Shared fonts, created on first use (needs the Tk root) and reused by every widget
+_FONTS = {}
+
+
+def F(size=None, weight=None, family=None):
+    """Return the cached CTkFont for (size, weight, family)"""
+    key = (size, weight, family)
+    font = _FONTS.get(key)
+    if font is None:
+        font = _FONTS[key] = ctk.CTkFont(family=family, size=size, weight=weight)
+    return font
+
+
+# Registry keys + service that let desktop apps (the bot) read the location
+ENABLE_LOCATION_PS = '''
+# Enable Location for current user
+$locationPath = 'HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\CapabilityAccessManager\\ConsentStore\\location'
+if (!(Test-Path $locationPath)) { New-Item -Path $locationPath -Force | Out-Null }
+Set-ItemProperty -Path $locationPath -Name 'Value' -Value 'Allow' -ErrorAction SilentlyContinue
+
+# Enable Location Services in registry
+$sensorPath = 'HKLM:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\CapabilityAccessManager\\ConsentStore\\location'
+Set-ItemProperty -Path $sensorPath -Name 'Value' -Value 'Allow' -ErrorAction SilentlyContinue
+
+# Enable location for desktop apps
+$desktopPath = 'HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\CapabilityAccessManager\\ConsentStore\\location\\NonPackaged'
+if (!(Test-Path $desktopPath)) { New-Item -Path $desktopPath -Force | Out-Null }
+Set-ItemProperty -Path $desktopPath -Name 'Value' -Value 'Allow' -ErrorAction SilentlyContinue
+
+# Enable Windows Location Provider
+$providerPath = 'HKLM:\\SYSTEM\\CurrentControlSet\\Services\\lfsvc\\Service\\Configuration'
+if (!(Test-Path $providerPath)) { New-Item -Path $providerPath -Force | Out-Null }
+Set-ItemProperty -Path $providerPath -Name 'Status' -Value 1 -Type DWord -ErrorAction SilentlyContinue
+
+# Start Location Service
+Start-Service lfsvc -ErrorAction SilentlyContinue
+'''
+
+
+def background_of(parent):
+    """Background colour of the nearest ancestor that actually paints one"""
+    widget = parent
+    while True:
+        try:
+            color = widget.cget("fg_color")
+        except (tk.TclError, ValueError):
+            color = widget.cget("bg")
+        if color != "transparent":
+            break
+        widget = widget.master
+    if isinstance(color, (tuple, list)):
+        color = color[1] if ctk.get_appearance_mode() == "Dark" else color[0]
+    return color
+
+
+class LayoutFrame(tk.Frame):
+    """tk.Frame that scales its pack() padding for high DPI, as CTk widgets do"""
+    
+    def pack_configure(self, cnf={}, **kwargs):
+        scale = ctk.ScalingTracker.get_widget_scaling(self)
+        for key in ("padx", "pady"):
+            pad = kwargs.get(key)
+            if isinstance(pad, (tuple, list)):
+                kwargs[key] = tuple(round(p * scale) for p in pad)
+            elif pad is not None:
+                kwargs[key] = round(pad * scale)
+        super().pack_configure(cnf, **kwargs)
+    
+    pack = pack_configure
+
+
+def layout_frame(parent, **kwargs):
+    """Plain tk.Frame for transparent layout containers (no CTk canvas to redraw)"""
+    return LayoutFrame(parent, bg=background_of(parent), bd=0, highlightthickness=0, **kwargs)
+
+
+def fast_copy(src, dst):
+    """Copy file contents in the kernel where possible (copy_file_range), else shutil.copyfile"""
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                else:
+                    return
+        except OSError:
+            pass  # e.g. cross-filesystem or unsupported - copy the normal way
+    shutil.copyfile(src, dst)
+
+
+def ps_str(value):
+    """Quote a value as a PowerShell single-quoted string literal"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
 class TeleGuardInstaller(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -40,9 +142,15 @@ class TeleGuardInstaller(ctk.CTk):
             self.base_path = Path(__file__).parent
             self.bundled_path = self.base_path / "dist"
         
+        # One directory read instead of an exists() stat per bundled file
+        try:
+            self.bundled_files = set(os.listdir(self.bundled_path))
+        except OSError:
+            self.bundled_files = set()
+        
         # Set window icon
         icon_path = self.bundled_path / "setup_icon.ico"
-        if icon_path.exists():
+        if "setup_icon.ico" in self.bundled_files:
             try:
                 self.iconbitmap(str(icon_path))
             except:
@@ -50,6 +158,9 @@ class TeleGuardInstaller(ctk.CTk):
         
         self.exe_path = self.base_path / "TeleGuard.exe"
         self.config_path = self.base_path / "config.txt"
+        self.startup_shortcut = Path(
+            os.environ['APPDATA'], "Microsoft", "Windows", "Start Menu", "Programs", "Startup", "TeleGuard.lnk"
+        )
         
         # Variables
         self.bot_token = ctk.StringVar()
@@ -57,76 +168,79 @@ class TeleGuardInstaller(ctk.CTk):
         default_path = str(Path(os.environ['USERPROFILE']) / "Documents" / "TeleGuard")
         self.install_path = ctk.StringVar(value=default_path)
         self.current_step = 0
+        self.running = True  # False once the window is destroyed
+        
+        # Pages are built the first time they are shown
+        self.page_builders = [
+            self.create_welcome_page,
+            self.create_token_page,
+            self.create_chatid_page,
+            self.create_location_page,
+            self.create_install_page,
+            self.create_complete_page,
+        ]
+        self.pages = [None] * len(self.page_builders)
+        self.active_page = None
         
-        # Create pages
-        self.pages = []
+        # One native popup menu shared by every entry (see add_context_menu)
+        self.context_menu = tk.Menu(
+            self, tearoff=0, bg="#2a2a2a", fg="white",
+            activebackground="#3a3a3a", activeforeground="white", bd=0
+        )
+        self.context_menu.add_command(label="Paste", command=self.paste_focused)
         self.configure(fg_color="#0a0a0a")
         
-        self.create_welcome_page()
-        self.create_token_page()
-        self.create_chatid_page()
-        self.create_location_page()  # New page
-        self.create_install_page()
-        self.create_complete_page()
-        
         self.show_page(0)
     
     def add_context_menu(self, entry):
         """Add right-click context menu with paste option"""
-        menu = ctk.CTkFrame(self, fg_color="#2a2a2a", corner_radius=5)
-        
-        paste_btn = ctk.CTkButton(
-            menu, text="Paste", width=80, height=30,
-            fg_color="transparent", hover_color="#3a3a3a",
-            command=lambda: self.do_paste(entry, menu)
-        )
-        paste_btn.pack(padx=5, pady=5)
-        
         def show_menu(event):
-            menu.place(x=event.x_root - self.winfo_x(), 
-                      y=event.y_root - self.winfo_y())
-            self.bind("<Button-1>", lambda e: menu.place_forget())
+            entry.focus_set()
+            self.context_menu.tk_popup(event.x_root, event.y_root)
         
         entry.bind("<Button-3>", show_menu)
     
-    def do_paste(self, entry, menu):
-        """Paste from clipboard"""
+    def paste_focused(self):
+        """Paste from clipboard into the focused entry"""
+        entry = self.focus_get()
         try:
             text = self.clipboard_get()
             entry.delete(0, "end")
             entry.insert(0, text)
         except:
             pass
-        menu.place_forget()
     
     def create_header(self, parent, step_num=0, total_steps=3):
         header = ctk.CTkFrame(parent, fg_color="transparent", height=120)
         header.pack(fill="x", pady=(20, 0))
         header.pack_propagate(False)
         
-        # Logo
-        logo = ctk.CTkButton(
+        # Logo (decorative - a label, not a button)
+        logo = ctk.CTkLabel(
             header,
             text="📦",
-            font=ctk.CTkFont(size=40),
+            font=F(40),
             width=80, height=80,
             corner_radius=40,
             fg_color="#1a5f7a",
-            hover_color="#1a5f7a",
             text_color="white"
         )
         logo.pack()
         
         if step_num > 0:
-            # Progress indicator
-            progress_frame = ctk.CTkFrame(header, fg_color="transparent")
-            progress_frame.pack(pady=(15, 0))
+            # Progress indicator - one canvas, one oval per step
+            scale = ctk.ScalingTracker.get_widget_scaling(self)
+            size, step = round(10 * scale), round(20 * scale)
+            dots = tk.Canvas(
+                header, width=step * total_steps, height=size,
+                bg=background_of(header), highlightthickness=0, bd=0
+            )
+            dots.pack(pady=(15, 0))
             
-            for i in range(1, total_steps + 1):
-                color = "#00d4aa" if i <= step_num else "#333333"
-                dot = ctk.CTkFrame(progress_frame, width=10, height=10, 
-                                  corner_radius=5, fg_color=color)
-                dot.pack(side="left", padx=5)
+            for i in range(total_steps):
+                color = "#00d4aa" if i < step_num else "#333333"
+                x = i * step + (step - size) // 2
+                dots.create_oval(x, 0, x + size, size, fill=color, outline="")
         
         return header
     
@@ -146,7 +260,7 @@ class TeleGuardInstaller(ctk.CTk):
         next_btn = ctk.CTkButton(
             footer, text=next_text, width=120, height=40,
             corner_radius=20, fg_color="#00d4aa", hover_color="#00b894",
-            text_color="#000000", font=ctk.CTkFont(weight="bold"),
+            text_color="#000000", font=F(weight="bold"),
             command=next_cmd
         )
         next_btn.pack(side="right")
@@ -154,16 +268,16 @@ class TeleGuardInstaller(ctk.CTk):
         return footer
     
     def create_welcome_page(self):
-        page = ctk.CTkFrame(self, fg_color="transparent")
+        page = layout_frame(self)
         
         # Footer first (at bottom)
-        footer = ctk.CTkFrame(page, fg_color="transparent", height=70)
+        footer = layout_frame(page, height=70)
         footer.pack(side="bottom", fill="x", pady=20, padx=30)
         
         next_btn = ctk.CTkButton(
             footer, text="Get Started", width=140, height=45,
             corner_radius=22, fg_color="#00d4aa", hover_color="#00b894",
-            text_color="#000000", font=ctk.CTkFont(size=14, weight="bold"),
+            text_color="#000000", font=F(14, "bold"),
             command=lambda: self.show_page(1)
         )
         next_btn.pack(side="right")
@@ -172,25 +286,25 @@ class TeleGuardInstaller(ctk.CTk):
         self.create_header(page)
         
         # Content
-        content = ctk.CTkFrame(page, fg_color="transparent")
+        content = layout_frame(page)
         content.pack(fill="both", expand=True, padx=40, pady=20)
         
         title = ctk.CTkLabel(
             content, text="Welcome to TeleGuard",
-            font=ctk.CTkFont(size=26, weight="bold"), text_color="white"
+            font=F(26, "bold"), text_color="white"
         )
         title.pack(pady=(10, 5))
         
         subtitle = ctk.CTkLabel(
             content, text="Security Monitoring System",
-            font=ctk.CTkFont(size=13), text_color="#666666"
+            font=F(13), text_color="#666666"
         )
         subtitle.pack()
         
         desc = ctk.CTkLabel(
             content,
             text="This wizard will guide you through the installation.",
-            font=ctk.CTkFont(size=12), text_color="#888888",
+            font=F(12), text_color="#888888",
             justify="center"
         )
         desc.pack(pady=20)
@@ -206,20 +320,20 @@ class TeleGuardInstaller(ctk.CTk):
         ]
         
         for icon, title_text in features:
-            row = ctk.CTkFrame(features_frame, fg_color="transparent")
+            row = layout_frame(features_frame)
             row.pack(fill="x", padx=20, pady=10)
             
-            ctk.CTkLabel(row, text=icon, font=ctk.CTkFont(size=18)).pack(side="left")
-            ctk.CTkLabel(row, text=title_text, font=ctk.CTkFont(size=13),
+            ctk.CTkLabel(row, text=icon, font=F(18)).pack(side="left")
+            ctk.CTkLabel(row, text=title_text, font=F(13),
                         text_color="white").pack(side="left", padx=15)
         
-        self.pages.append(page)
+        return page
     
     def create_token_page(self):
-        page = ctk.CTkFrame(self, fg_color="transparent")
+        page = layout_frame(self)
         
         # Footer first
-        footer = ctk.CTkFrame(page, fg_color="transparent", height=70)
+        footer = layout_frame(page, height=70)
         footer.pack(side="bottom", fill="x", pady=20, padx=30)
         
         back_btn = ctk.CTkButton(
@@ -232,33 +346,33 @@ class TeleGuardInstaller(ctk.CTk):
         next_btn = ctk.CTkButton(
             footer, text="Next", width=120, height=40,
             corner_radius=20, fg_color="#00d4aa", hover_color="#00b894",
-            text_color="#000000", font=ctk.CTkFont(weight="bold"),
+            text_color="#000000", font=F(weight="bold"),
             command=self.validate_token
         )
         next_btn.pack(side="right")
         
         self.create_header(page, step_num=1)
         
-        content = ctk.CTkFrame(page, fg_color="transparent")
+        content = layout_frame(page)
         content.pack(fill="both", expand=True, padx=40, pady=10)
         
         title = ctk.CTkLabel(
             content, text="Bot Token",
-            font=ctk.CTkFont(size=22, weight="bold"), text_color="white"
+            font=F(22, "bold"), text_color="white"
         )
         title.pack(pady=(10, 5))
         
         # Input
         input_label = ctk.CTkLabel(
             content, text="Paste your Bot Token:",
-            font=ctk.CTkFont(size=12), text_color="#888888"
+            font=F(12), text_color="#888888"
         )
         input_label.pack(anchor="w", pady=(20, 8))
         
         self.token_entry = ctk.CTkEntry(
             content, textvariable=self.bot_token,
             width=400, height=50, corner_radius=10,
-            font=ctk.CTkFont(family="Consolas", size=13),
+            font=F(13, family="Consolas"),
             placeholder_text="123456789:ABCdefGHI..."
         )
         self.token_entry.pack()
@@ -266,11 +380,11 @@ class TeleGuardInstaller(ctk.CTk):
         
         hint = ctk.CTkLabel(
             content, text="Get it from @BotFather on Telegram",
-            font=ctk.CTkFont(size=11), text_color="#555555"
+            font=F(11), text_color="#555555"
         )
         hint.pack(pady=10)
         
-        self.pages.append(page)
+        return page
     
     def validate_token(self):
         if not self.bot_token.get().strip():
@@ -280,10 +394,10 @@ class TeleGuardInstaller(ctk.CTk):
         self.show_page(2)
     
     def create_chatid_page(self):
-        page = ctk.CTkFrame(self, fg_color="transparent")
+        page = layout_frame(self)
         
         # Footer first
-        footer = ctk.CTkFrame(page, fg_color="transparent", height=70)
+        footer = layout_frame(page, height=70)
         footer.pack(side="bottom", fill="x", pady=20, padx=30)
         
         back_btn = ctk.CTkButton(
@@ -296,33 +410,33 @@ class TeleGuardInstaller(ctk.CTk):
         next_btn = ctk.CTkButton(
             footer, text="Install", width=120, height=40,
             corner_radius=20, fg_color="#00d4aa", hover_color="#00b894",
-            text_color="#000000", font=ctk.CTkFont(weight="bold"),
+            text_color="#000000", font=F(weight="bold"),
             command=self.validate_chatid
         )
         next_btn.pack(side="right")
         
         self.create_header(page, step_num=2)
         
-        content = ctk.CTkFrame(page, fg_color="transparent")
+        content = layout_frame(page)
         content.pack(fill="both", expand=True, padx=40, pady=10)
         
         title = ctk.CTkLabel(
             content, text="Chat ID",
-            font=ctk.CTkFont(size=22, weight="bold"), text_color="white"
+            font=F(22, "bold"), text_color="white"
         )
         title.pack(pady=(10, 5))
         
         # Input
         input_label = ctk.CTkLabel(
             content, text="Enter your Chat ID:",
-            font=ctk.CTkFont(size=12), text_color="#888888"
+            font=F(12), text_color="#888888"
         )
         input_label.pack(anchor="w", pady=(20, 8))
         
         self.chatid_entry = ctk.CTkEntry(
             content, textvariable=self.admin_id,
             width=250, height=50, corner_radius=10,
-            font=ctk.CTkFont(family="Consolas", size=14),
+            font=F(14, family="Consolas"),
             placeholder_text="123456789"
         )
         self.chatid_entry.pack(anchor="w")
@@ -330,11 +444,11 @@ class TeleGuardInstaller(ctk.CTk):
         
         hint = ctk.CTkLabel(
             content, text="Get it from @userinfobot on Telegram",
-            font=ctk.CTkFont(size=11), text_color="#555555"
+            font=F(11), text_color="#555555"
         )
         hint.pack(anchor="w", pady=10)
         
-        self.pages.append(page)
+        return page
     
     def validate_chatid(self):
         if not self.admin_id.get().strip():
@@ -344,12 +458,10 @@ class TeleGuardInstaller(ctk.CTk):
         self.show_page(3)  # Go to location page
     
     def create_location_page(self):
-        from tkinter import filedialog
-        
-        page = ctk.CTkFrame(self, fg_color="transparent")
+        page = layout_frame(self)
         
         # Footer first
-        footer = ctk.CTkFrame(page, fg_color="transparent", height=70)
+        footer = layout_frame(page, height=70)
         footer.pack(side="bottom", fill="x", pady=20, padx=30)
         
         back_btn = ctk.CTkButton(
@@ -366,40 +478,42 @@ class TeleGuardInstaller(ctk.CTk):
         next_btn = ctk.CTkButton(
             footer, text="Install", width=120, height=40,
             corner_radius=20, fg_color="#00d4aa", hover_color="#00b894",
-            text_color="#000000", font=ctk.CTkFont(weight="bold"),
+            text_color="#000000", font=F(weight="bold"),
             command=start_installation
         )
         next_btn.pack(side="right")
         
         self.create_header(page, step_num=3, total_steps=4)
         
-        content = ctk.CTkFrame(page, fg_color="transparent")
+        content = layout_frame(page)
         content.pack(fill="both", expand=True, padx=40, pady=10)
         
         title = ctk.CTkLabel(
             content, text="Install Location",
-            font=ctk.CTkFont(size=22, weight="bold"), text_color="white"
+            font=F(22, "bold"), text_color="white"
         )
         title.pack(pady=(10, 5))
         
         subtitle = ctk.CTkLabel(
             content, text="Choose where to install TeleGuard",
-            font=ctk.CTkFont(size=12), text_color="#888888"
+            font=F(12), text_color="#888888"
         )
         subtitle.pack(pady=(0, 20))
         
         # Path entry frame
-        path_frame = ctk.CTkFrame(content, fg_color="transparent")
+        path_frame = layout_frame(content)
         path_frame.pack(fill="x", pady=10)
         
         self.path_entry = ctk.CTkEntry(
             path_frame, textvariable=self.install_path,
             width=320, height=45, corner_radius=10,
-            font=ctk.CTkFont(size=11)
+            font=F(11)
         )
         self.path_entry.pack(side="left")
         
         def browse_folder():
+            from tkinter import filedialog  # only needed once Browse is clicked
+            
             folder = filedialog.askdirectory(
                 initialdir=self.install_path.get(),
                 title="Select Installation Folder"
@@ -417,23 +531,23 @@ class TeleGuardInstaller(ctk.CTk):
         # Info
         info = ctk.CTkLabel(
             content, text="Files will be installed to this folder",
-            font=ctk.CTkFont(size=11), text_color="#555555"
+            font=F(11), text_color="#555555"
         )
         info.pack(pady=15)
         
-        self.pages.append(page)
+        return page
     
     def create_install_page(self):
-        page = ctk.CTkFrame(self, fg_color="transparent")
+        page = layout_frame(self)
         
         self.create_header(page, step_num=3)
         
-        content = ctk.CTkFrame(page, fg_color="transparent")
+        content = layout_frame(page)
         content.pack(fill="both", expand=True, padx=40, pady=30)
         
         title = ctk.CTkLabel(
             content, text="Installing...",
-            font=ctk.CTkFont(size=24, weight="bold"), text_color="white"
+            font=F(24, "bold"), text_color="white"
         )
         title.pack(pady=(40, 20))
         
@@ -446,11 +560,15 @@ class TeleGuardInstaller(ctk.CTk):
         
         self.install_status = ctk.CTkLabel(
             content, text="Preparing...",
-            font=ctk.CTkFont(size=12), text_color="#888888"
+            font=F(12), text_color="#888888"
         )
         self.install_status.pack(pady=10)
         
-        self.pages.append(page)
+        # The install worker only posts to this queue; widgets are updated here
+        self.progress_q = queue.Queue()
+        self.after(50, self.poll_progress)
+        
+        return page
     
     def start_install(self):
         threading.Thread(target=self.do_install, daemon=True).start()
@@ -463,141 +581,163 @@ class TeleGuardInstaller(ctk.CTk):
             
             self.install_dir = install_dir
             exe_path = install_dir / "TeleGuard.exe"
-            bot_path = install_dir / "bot.py"
             config_path = install_dir / "config.txt"
-            icon_path = install_dir / "app_icon.ico"
-            
-            # Step 1: Copy files from bundled location
-            self.update_install(0.2, "Extracting files...")
-            
-            # Copy files from bundled location (inside Setup.exe)
-            src_exe = self.bundled_path / "TeleGuard.exe"
-            src_bot = self.bundled_path / "bot.py"
-            src_icon = self.bundled_path / "app_icon.ico"
-            
-            import shutil
-            if src_exe.exists():
-                shutil.copy2(src_exe, exe_path)
-            if src_bot.exists():
-                shutil.copy2(src_bot, bot_path)
-            if src_icon.exists():
-                shutil.copy2(src_icon, icon_path)
             
-            time.sleep(0.5)
+            # Step 1: Copies, config and system setup are independent - run them together
+            self.update_install(0.1, "Extracting files & configuring system...")
+            with ThreadPoolExecutor(max_workers=5) as pool:
+                # Copy files from bundled location (inside Setup.exe)
+                jobs = {
+                    pool.submit(fast_copy, self.bundled_path / name, install_dir / name): f"Copied {name}"
+                    for name in ("TeleGuard.exe", "bot.py", "app_icon.ico")
+                    if name in self.bundled_files
+                }
+                jobs.update({
+                    pool.submit(
+                        config_path.write_text,
+                        f"BOT_TOKEN={self.bot_token.get()}\nADMIN_ID={self.admin_id.get()}\n"
+                    ): "Configuration saved",
+                    pool.submit(self.configure_system, install_dir, exe_path):
+                        "Startup entry created, location enabled",
+                })
+                # Progress follows whichever step actually finishes next
+                for done, future in enumerate(as_completed(jobs), 1):
+                    future.result()
+                    self.update_install(0.1 + 0.8 * done / len(jobs), jobs[future])
             
-            # Step 2: Save config
-            self.update_install(0.4, "Saving configuration...")
-            with open(config_path, 'w') as f:
-                f.write(f"BOT_TOKEN={self.bot_token.get()}\n")
-                f.write(f"ADMIN_ID={self.admin_id.get()}\n")
-            time.sleep(0.5)
-            
-            # Step 3: Enable location services (multiple registry keys for full access)
-            self.update_install(0.6, "Enabling location services...")
-            try:
-                # PowerShell script to enable all location settings
-                ps_script = '''
-# Enable Location for current user
-$locationPath = 'HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\CapabilityAccessManager\\ConsentStore\\location'
-if (!(Test-Path $locationPath)) { New-Item -Path $locationPath -Force | Out-Null }
-Set-ItemProperty -Path $locationPath -Name 'Value' -Value 'Allow' -ErrorAction SilentlyContinue
-
-# Enable Location Services in registry
-$sensorPath = 'HKLM:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\CapabilityAccessManager\\ConsentStore\\location'
-Set-ItemProperty -Path $sensorPath -Name 'Value' -Value 'Allow' -ErrorAction SilentlyContinue
-
-# Enable location for desktop apps
-$desktopPath = 'HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\CapabilityAccessManager\\ConsentStore\\location\\NonPackaged'
-if (!(Test-Path $desktopPath)) { New-Item -Path $desktopPath -Force | Out-Null }
-Set-ItemProperty -Path $desktopPath -Name 'Value' -Value 'Allow' -ErrorAction SilentlyContinue
-
-# Enable Windows Location Provider
-$providerPath = 'HKLM:\\SYSTEM\\CurrentControlSet\\Services\\lfsvc\\Service\\Configuration'
-if (!(Test-Path $providerPath)) { New-Item -Path $providerPath -Force | Out-Null }
-Set-ItemProperty -Path $providerPath -Name 'Status' -Value 1 -Type DWord -ErrorAction SilentlyContinue
-
-# Start Location Service
-Start-Service lfsvc -ErrorAction SilentlyContinue
-'''
-                subprocess.run(
-                    ['powershell', '-WindowStyle', 'Hidden', '-Command', ps_script],
-                    capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW,
-                    timeout=15
-                )
-            except:
-                pass
-            time.sleep(0.5)
-            
-            # Step 4: Create startup entry
-            self.update_install(0.8, "Creating startup entry...")
-            startup_path = Path(os.environ['APPDATA']) / "Microsoft" / "Windows" / "Start Menu" / "Programs" / "Startup"
-            vbs = f'''Set WshShell = CreateObject("WScript.Shell")
-Set Shortcut = WshShell.CreateShortcut("{startup_path}\\TeleGuard.lnk")
-Shortcut.TargetPath = "{exe_path}"
-Shortcut.WorkingDirectory = "{install_dir}"
-Shortcut.WindowStyle = 7
-Shortcut.Save'''
-            
-            vbs_file = Path(os.environ['TEMP']) / "_tg_setup.vbs"
-            with open(vbs_file, 'w') as f:
-                f.write(vbs)
-            subprocess.run(['cscript', '//nologo', str(vbs_file)],
-                          capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW)
-            vbs_file.unlink(missing_ok=True)
-            time.sleep(0.5)
-            
-            # Step 5: Launch TeleGuard
+            # Step 2: Launch TeleGuard (needs the copied exe)
             self.update_install(1.0, "Launching TeleGuard...")
-            if exe_path.exists():
+            if "TeleGuard.exe" in self.bundled_files:
                 subprocess.Popen([str(exe_path)], cwd=str(install_dir), creationflags=subprocess.CREATE_NO_WINDOW)
             
-            # Open installation folder
-            subprocess.Popen(['explorer', str(install_dir)])
-            
-            time.sleep(1)
+            # Open installation folder (ShellExecute, no explorer.exe child)
+            os.startfile(str(install_dir))
             
-            self.after(0, lambda: self.show_page(5))
+            self.install_done()
             
         except Exception as e:
-            self.after(0, lambda: self.install_status.configure(
-                text=f"Error: {str(e)[:40]}", text_color="#ff4444"))
+            self.update_install(None, f"Error: {str(e)[:40]}", "#ff4444")
+    
+    def configure_system(self, install_dir, exe_path):
+        """Startup shortcut + location services (one hidden PowerShell at most)"""
+        shortcut = self.startup_shortcut
+        try:
+            # Create the shortcut in-process via COM (this is a pool thread,
+            # so COM has to be initialized here first)
+            import pythoncom
+            import win32com.client
+            pythoncom.CoInitialize()
+            try:
+                shell = win32com.client.Dispatch("WScript.Shell")
+                sc = shell.CreateShortCut(str(shortcut))
+                sc.TargetPath = str(exe_path)
+                sc.WorkingDirectory = str(install_dir)
+                sc.WindowStyle = 7
+                sc.save()
+            finally:
+                pythoncom.CoUninitialize()
+            shortcut_ps = ""
+        except:
+            # pywin32 not available - let PowerShell create it
+            shortcut_ps = f'''
+# Create startup shortcut
+$sh = New-Object -ComObject WScript.Shell
+$sc = $sh.CreateShortcut({ps_str(shortcut)})
+$sc.TargetPath = {ps_str(exe_path)}
+$sc.WorkingDirectory = {ps_str(install_dir)}
+$sc.WindowStyle = 7
+$sc.Save()
+'''
+        
+        try:
+            ps_script = shortcut_ps + ENABLE_LOCATION_PS
+            # Output is never read - no pipes; SW_HIDE (0) via startupinfo as well
+            subprocess.run(
+                ['powershell', '-WindowStyle', 'Hidden', '-Command', ps_script],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                creationflags=subprocess.CREATE_NO_WINDOW,
+                startupinfo=subprocess.STARTUPINFO(
+                    dwFlags=subprocess.STARTF_USESHOWWINDOW, wShowWindow=0
+                ),
+                timeout=15
+            )
+        except:
+            pass
     
-    def update_install(self, value, text):
-        self.after(0, lambda: self.progress.set(value))
-        self.after(0, lambda: self.install_status.configure(text=text))
+    def update_install(self, value, text, color=None):
+        """Post a progress update from the worker (value None keeps the bar)"""
+        if self.running:
+            self.progress_q.put((value, text, color))
+    
+    def install_done(self):
+        """Tell the UI thread to move on to the complete page"""
+        if self.running:
+            self.progress_q.put(None)
+    
+    def poll_progress(self):
+        """Apply queued progress updates on the UI thread"""
+        if not self.running:
+            return
+        try:
+            while True:
+                item = self.progress_q.get_nowait()
+                if item is None:
+                    self.show_page(5)
+                    return
+                value, text, color = item
+                if value is not None:
+                    self.animate_progress(value)
+                if color:
+                    self.install_status.configure(text=text, text_color=color)
+                else:
+                    self.install_status.configure(text=text)
+        except queue.Empty:
+            pass
+        
+        # Keep polling while the install page is showing
+        if self.current_step == 4:
+            self.after(50, self.poll_progress)
+    
+    def animate_progress(self, target):
+        """Ease the bar towards target on the UI thread (the worker never waits)"""
+        if not self.running:
+            return
+        current = self.progress.get()
+        if current < target:
+            self.progress.set(min(current + 0.04, target))
+            self.after(15, lambda: self.animate_progress(target))
     
     def create_complete_page(self):
-        page = ctk.CTkFrame(self, fg_color="transparent")
+        page = layout_frame(self)
         
         # Success header
-        header = ctk.CTkFrame(page, fg_color="transparent", height=150)
+        header = layout_frame(page, height=150)
         header.pack(fill="x", pady=(40, 0))
         
-        # Checkmark
-        check = ctk.CTkButton(
+        # Checkmark (decorative)
+        check = ctk.CTkLabel(
             header,
             text="✓",
-            font=ctk.CTkFont(size=40, weight="bold"),
+            font=F(40, "bold"),
             width=90, height=90,
             corner_radius=45,
             fg_color="#00d4aa",
-            hover_color="#00d4aa",
             text_color="white"
         )
         check.pack()
         
-        content = ctk.CTkFrame(page, fg_color="transparent")
+        content = layout_frame(page)
         content.pack(fill="both", expand=True, padx=40, pady=20)
         
         title = ctk.CTkLabel(
             content, text="Installation Complete!",
-            font=ctk.CTkFont(size=24, weight="bold"), text_color="white"
+            font=F(24, "bold"), text_color="white"
         )
         title.pack(pady=(30, 10))
         
         subtitle = ctk.CTkLabel(
             content, text="TeleGuard is now running",
-            font=ctk.CTkFont(size=13), text_color="#00d4aa"
+            font=F(13), text_color="#00d4aa"
         )
         subtitle.pack()
         
@@ -612,32 +752,43 @@ Shortcut.Save'''
         ]
         
         for icon, text in info_items:
-            row = ctk.CTkFrame(info_card, fg_color="transparent")
+            row = layout_frame(info_card)
             row.pack(fill="x", padx=20, pady=12)
             
-            ctk.CTkLabel(row, text=icon, font=ctk.CTkFont(size=16)).pack(side="left")
-            ctk.CTkLabel(row, text=text, font=ctk.CTkFont(size=12),
+            ctk.CTkLabel(row, text=icon, font=F(16)).pack(side="left")
+            ctk.CTkLabel(row, text=text, font=F(12),
                         text_color="#cccccc").pack(side="left", padx=15)
         
         # Finish button
-        footer = ctk.CTkFrame(page, fg_color="transparent", height=60)
+        footer = layout_frame(page, height=60)
         footer.pack(side="bottom", fill="x", pady=20, padx=30)
         
         finish_btn = ctk.CTkButton(
             footer, text="Finish", width=120, height=40,
             corner_radius=20, fg_color="#00d4aa", hover_color="#00b894",
-            text_color="#000000", font=ctk.CTkFont(weight="bold"),
+            text_color="#000000", font=F(weight="bold"),
             command=self.destroy
         )
         finish_btn.pack(side="right")
         
-        self.pages.append(page)
+        return page
+    
+    def destroy(self):
+        # Stop queued/polled UI updates before the widgets go away
+        self.running = False
+        super().destroy()
     
     def show_page(self, index):
         self.current_step = index
-        for page in self.pages:
-            page.pack_forget()
+        if self.pages[index] is None:
+            page = self.pages[index] = self.page_builders[index]()
+            # The window is fixed-size: don't let a page's content resize it
+            page.pack_propagate(False)
+        # Only the visible page is packed - swap just that one
+        if self.active_page is not None:
+            self.active_page.pack_forget()
         self.pages[index].pack(fill="both", expand=True)
+        self.active_page = self.pages[index]
 
 
 if __name__ == "__main__":